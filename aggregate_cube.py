@@ -0,0 +1,156 @@
+import pandas as pd
+import numpy as np
+from dataset_registry import get_registry
+from data_loader import DATE_COL
+
+# Level names of the cube's cell index
+AREA, PERIOD, CRIME = 'area', 'period', 'crime'
+
+# Time granularities of the trend tabs and the pandas frequency of their
+# buckets; yearly cubes use the integer Year column instead of timestamps
+GRANULARITIES = {'D': 'D', 'W': 'W-MON', 'M': 'MS', 'Y': None}
+
+
+def time_buckets(dates, granularity):
+    """Floor datetime64 values to the start of their day, week (Monday) or month.
+
+    Works on the raw datetime64 array with NumPy unit casts, so millions of
+    timestamps are bucketed without a per-row Python call.
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if granularity == 'D':
+        buckets = days
+    elif granularity == 'W':
+        # 1970-01-01 was a Thursday: (day + 3) % 7 is days since Monday
+        ordinals = days.astype('int64')
+        buckets = (ordinals - (ordinals + 3) % 7).astype('datetime64[D]')
+    elif granularity == 'M':
+        buckets = days.astype('datetime64[M]')
+    else:
+        raise ValueError(f"Unknown granularity {granularity!r}")
+    return buckets.astype('datetime64[ns]')
+
+
+class AggregateCube:
+    """Case totals per area x period x crime type, built once per dataset.
+
+    The period is the Year column for yearly cubes, or the day, week or month
+    bucket of each incident's timestamp for finer granularities. Series for a
+    single area or crime type are served from per-dimension indexes, so tab
+    selections are dictionary lookups instead of scans over the raw rows.
+    Roll-ups and matrices are derived from the aggregated cells only.
+
+    When the data is known to stop early (`coverage_end`, e.g. the ingestion
+    time of a watched directory) before the final day of the last period,
+    that period only covers part of its span; it is left out of the series
+    and matrices so it does not read as a sudden drop (and skew forecasts and
+    % change). Totals still include it. Without a coverage end every period
+    is kept: the date of the latest incident says nothing about coverage,
+    since sparse data can be complete.
+    """
+
+    def __init__(self, cells, locations=None, crime_types=None, granularity='Y', coverage_end=None):
+        self.cells = cells
+        self.granularity = granularity
+        self.freq = GRANULARITIES[granularity]
+        self.coverage_end = coverage_end
+        self.partial_period = self._partial_period()
+        self.locations = list(locations) if locations is not None else list(self._level_values(AREA))
+        self.crime_types = list(crime_types) if crime_types is not None else list(self._level_values(CRIME))
+        self._index = {AREA: self._build_index(AREA), CRIME: self._build_index(CRIME)}
+
+    @classmethod
+    def from_frame(cls, df, col_area, crime_col='Group_Name', granularity='Y', coverage_end=None):
+        """Aggregate raw rows into cube cells, keeping first-seen label order"""
+        if granularity == 'Y':
+            period = df['Year']
+        else:
+            period = pd.Series(time_buckets(df[DATE_COL].to_numpy(), granularity), index=df.index)
+        cells = df.groupby([df[col_area], period, df[crime_col]], observed=True)['cases'].sum()
+        cells.index = cells.index.set_names([AREA, PERIOD, CRIME])
+        return cls(cells, pd.unique(df[col_area]), pd.unique(df[crime_col]), granularity, coverage_end)
+
+    def _level_values(self, level):
+        return self.cells.index.get_level_values(level).unique()
+
+    def _partial_period(self):
+        """The last period if coverage ends before its final day; None if complete or unknown"""
+        if self.coverage_end is None or pd.isna(self.coverage_end) or self.cells.empty:
+            return None
+        periods = self.cells.index.get_level_values(PERIOD)
+        first, last = periods.min(), periods.max()
+        if first == last:
+            return None  # A lone period is kept, partial or not
+        if self.freq is None:
+            final_day = pd.Timestamp(year=int(last), month=12, day=31)
+        else:
+            final_day = pd.date_range(last, periods=2, freq=self.freq)[1] - pd.Timedelta(days=1)
+        return last if pd.Timestamp(self.coverage_end).normalize() < final_day else None
+
+    def _build_index(self, level):
+        """Map every value of one dimension to its case series"""
+        per_period = self.cells.groupby(level=[level, PERIOD], observed=True).sum()
+        return {
+            key: series.droplevel(0).rename('cases')
+            for key, series in per_period.groupby(level=0, observed=True)
+        }
+
+    def periods(self):
+        """Every complete bucket from the first to the last, for cubes with dated periods"""
+        values = self.cells.index.get_level_values(PERIOD)
+        periods = pd.date_range(values.min(), values.max(), freq=self.freq, name=PERIOD)
+        return periods[:-1] if self.partial_period is not None else periods
+
+    def _complete(self, series):
+        """Give a dated series every complete bucket of the cube, zero where nothing was reported"""
+        if series.empty:
+            return series
+        if self.freq is None:
+            return series.drop(self.partial_period, errors='ignore') if self.partial_period is not None else series
+        return series.reindex(self.periods(), fill_value=0)
+
+    def location_series(self, location):
+        """Cases per period for one location"""
+        return self._complete(self._index[AREA].get(location, pd.Series(dtype=float, name='cases')))
+
+    def crime_series(self, crime_type):
+        """Cases per period for one crime type"""
+        return self._complete(self._index[CRIME].get(crime_type, pd.Series(dtype=float, name='cases')))
+
+    def matrix(self, dimension=AREA):
+        """A dimension x periods matrix of cases.
+
+        Yearly matrices hold NaN where there is no data; dated matrices span
+        every complete bucket of the cube, with zero for buckets without
+        incidents. A partial last period is left out of both.
+        """
+        matrix = self.cells.groupby(level=[dimension, PERIOD], observed=True).sum().unstack(PERIOD).sort_index(axis=1)
+        if self.freq is not None:
+            matrix = matrix.reindex(columns=self.periods(), fill_value=0).fillna(0)
+        elif self.partial_period is not None:
+            matrix = matrix.drop(columns=self.partial_period)
+        return matrix
+
+    def totals(self, dimension=AREA):
+        """Total cases per value of a dimension"""
+        return self.cells.groupby(level=dimension, observed=True).sum()
+
+    def rollup(self, mapping, dimension=AREA):
+        """Re-aggregate the cube with a dimension mapped to coarser units.
+
+        `mapping` maps child labels (e.g. districts) to parents (e.g. states);
+        unmapped labels are kept as they are.
+        """
+        parents = self.cells.index.get_level_values(dimension).map(lambda label: mapping.get(label, label))
+        levels = [parents if name == dimension else self.cells.index.get_level_values(name)
+                  for name in (AREA, PERIOD, CRIME)]
+        cells = self.cells.groupby(levels, observed=True).sum()
+        cells.index = cells.index.set_names([AREA, PERIOD, CRIME])
+        return AggregateCube(cells, granularity=self.granularity, coverage_end=self.coverage_end)
+
+
+def build_cube(dataset_key, df, col_area, granularity='Y', coverage_end=None):
+    """Build (once per dataset and granularity) the aggregate cube used by the trend tabs"""
+    key = ('cube', dataset_key) if granularity == 'Y' else ('cube', dataset_key, granularity)
+    return get_registry().get_or_create(
+        key, lambda: AggregateCube.from_frame(df, col_area, granularity=granularity, coverage_end=coverage_end))
@@ -1,52 +1,257 @@
 import streamlit as st
 import hashlib
-import json
+import secrets
+import base64
+import hmac
+import time
 import os
+import threading
+from functools import lru_cache
+from user_store import get_user_store
+from perf import timed
 
-# File to store user credentials
-USERS_FILE = "users.json"
+# PBKDF2 work factor for stored password hashes
+PBKDF2_ITERATIONS = 200_000
+
+# How long a session token stays valid
+SESSION_TTL_SECONDS = int(os.environ.get("CRIMESCAN_SESSION_TTL", str(12 * 3600)))
+
+# Cookie carrying the session token across refreshes and reconnects
+SESSION_COOKIE = "crimescan_session"
+
+# URL query parameter that carried the token in earlier versions; stripped on sight
+SESSION_PARAM = "session"
+
+# Signing key (generated on first use unless CRIMESCAN_SECRET is set)
+SECRET_FILE = ".crimescan_secret"
+
+# Revoked session nonces, with their expiry, so logouts survive restarts
+REVOKED_FILE = ".crimescan_revoked"
+
+# Usernames allowed to see the performance panel (comma separated)
+ADMIN_USERS = {name.strip() for name in os.environ.get("CRIMESCAN_ADMINS", "").split(",") if name.strip()}
+
+_revoked_lock = threading.Lock()
+_revoked_cache = (None, {})
 
 def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password with salted PBKDF2-SHA256"""
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), PBKDF2_ITERATIONS).hex()
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt}${digest}"
 
-def load_users():
-    """Load users from file"""
-    if os.path.exists(USERS_FILE):
+def check_password(password, stored):
+    """Check a password against a stored hash (PBKDF2 or legacy unsalted SHA-256)"""
+    if stored.startswith("pbkdf2_sha256$"):
+        try:
+            _, iterations, salt, digest = stored.split("$")
+            candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations)).hex()
+        except ValueError:
+            return False  # A malformed stored hash matches no password
+    else:
+        digest = stored
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(candidate, digest)
+
+@lru_cache(maxsize=1)
+def _session_secret():
+    """Key used to sign session tokens"""
+    secret = os.environ.get("CRIMESCAN_SECRET")
+    if secret:
+        return secret.encode()
+    if not os.path.exists(SECRET_FILE):
         try:
-            with open(USERS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+            fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass  # Another process created it first
+    with open(SECRET_FILE) as f:
+        return f.read().strip().encode()
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(body):
+    return _b64(hmac.new(_session_secret(), body.encode(), hashlib.sha256).digest())
+
+def _revoked_signature():
+    """(mtime, size) of the revocation file, or None when there is none"""
+    try:
+        stat = os.stat(REVOKED_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _read_revoked():
+    """Unexpired nonces in the revocation file mapped to their expiry, and the count of expired lines"""
+    revoked = {}
+    expired = 0
+    now = time.time()
+    try:
+        with open(REVOKED_FILE) as f:
+            for line in f:
+                nonce, _, expires = line.strip().partition(" ")
+                if expires.isdigit() and int(expires) > now:
+                    revoked[nonce] = int(expires)
+                else:
+                    expired += 1
+    except FileNotFoundError:
+        pass
+    return revoked, expired
+
+def _revoked():
+    """Revoked nonces, re-read whenever the file changes (e.g. a logout in another process)"""
+    global _revoked_cache
+    signature = _revoked_signature()
+    with _revoked_lock:
+        if _revoked_cache[0] != signature:
+            _revoked_cache = (signature, _read_revoked()[0])
+        return _revoked_cache[1]
+
+def issue_session_token(username):
+    """Create a signed token for username that expires after SESSION_TTL_SECONDS"""
+    expires = int(time.time()) + SESSION_TTL_SECONDS
+    body = _b64(f"{username}|{expires}|{secrets.token_urlsafe(12)}".encode())
+    return f"{body}.{_sign(body)}"
+
+def _parse_session_token(token):
+    """Return (username, expires, nonce) for a correctly signed token, else None"""
+    try:
+        body, signature = token.rsplit(".", 1)
+        if not hmac.compare_digest(signature, _sign(body)):
+            return None
+        username, expires, nonce = _unb64(body).decode().rsplit("|", 2)
+        return username, int(expires), nonce
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def verify_session_token(token):
+    """Return the username of a valid, unexpired, unrevoked token, else None"""
+    parsed = _parse_session_token(token) if token else None
+    if parsed is None:
+        return None
+    username, expires, nonce = parsed
+    if expires < time.time() or nonce in _revoked():
+        return None
+    return username
+
+def revoke_session_token(token):
+    """Invalidate a token server-side before it expires"""
+    global _revoked_cache
+    parsed = _parse_session_token(token) if token else None
+    if parsed is None:
+        return
+    _, expires, nonce = parsed
+    with _revoked_lock:
+        # Appending keeps concurrent logouts from other processes intact
+        with open(REVOKED_FILE, "a") as f:
+            f.write(f"{nonce} {expires}\n")
+        revoked, expired = _read_revoked()
+        if expired:
+            # Drop lines of tokens that have expired anyway
+            tmp_path = f"{REVOKED_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(f"{n} {e}\n" for n, e in revoked.items())
+            os.replace(tmp_path, REVOKED_FILE)
+        _revoked_cache = (_revoked_signature(), revoked)
+
+def load_users():
+    """Load users from the configured user store"""
+    return get_user_store().load()
 
 def save_users(users):
-    """Save users to file"""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f)
+    """Replace all users in the configured user store"""
+    get_user_store().save_all(users)
 
 def register_user(username, password, email):
     """Register a new user"""
-    users = load_users()
-    
-    if username in users:
-        return False, "Username already exists"
-    
-    users[username] = {
+    added = get_user_store().add(username, {
         "password": hash_password(password),
         "email": email
-    }
-    save_users(users)
+    })
+    
+    if not added:
+        return False, "Username already exists"
     return True, "Registration successful"
 
+@timed("verify_user")
 def verify_user(username, password):
     """Verify user credentials"""
-    users = load_users()
+    store = get_user_store()
+    user = store.get(username)
     
-    if username not in users:
+    if user is None:
         return False
     
-    return users[username]["password"] == hash_password(password)
+    if not check_password(password, user["password"]):
+        return False
+    
+    # Upgrade legacy SHA-256 hashes to PBKDF2 on successful login
+    if not user["password"].startswith("pbkdf2_sha256$"):
+        store.update(username, dict(user, password=hash_password(password)))
+    return True
+
+def is_admin(username):
+    """Whether a user may see the admin-only panels"""
+    return username in ADMIN_USERS
+
+def start_session(username):
+    """Mark the session as logged in and hand the browser a signed token"""
+    token = issue_session_token(username)
+    st.session_state.logged_in = True
+    st.session_state.username = username
+    st.session_state.session_token = token
+
+def _run_script(script):
+    """Run JavaScript in an invisible same-origin frame (st.iframe, or components.html on older Streamlit)"""
+    html = f"<script>{script}</script>"
+    if hasattr(st, "iframe"):
+        st.iframe(html, height="content")
+    else:
+        import streamlit.components.v1 as components
+        components.html(html, height=0)
+
+def _sync_session_cookie(token):
+    """Write the token to the browser's session cookie, or clear it for None.
+
+    The cookie is set from an invisible frame, so it only runs when the
+    value differs from what this session last wrote (or, on a fresh page, from
+    what the browser sent).
+    """
+    current = st.session_state.get("session_cookie", st.context.cookies.get(SESSION_COOKIE))
+    if current == token:
+        return
+    max_age = SESSION_TTL_SECONDS if token else 0
+    _run_script(f"""
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = "{SESSION_COOKIE}={token or ''}; Path=/; Max-Age={max_age}; SameSite=Strict" + secure;
+    """)
+    st.session_state.session_cookie = token
+
+def restore_session():
+    """Validate the session token on every run (an HMAC check, no user lookup).
+
+    Refreshes and reconnects lose st.session_state but keep cookies, so a
+    valid token there logs the user back in without the password path. The
+    token is never put in the URL, where it would leak through history,
+    bookmarks and shared links.
+    """
+    token = st.session_state.get("session_token") or st.context.cookies.get(SESSION_COOKIE)
+    username = verify_session_token(token)
+    if username is None:
+        st.session_state.logged_in = False
+        st.session_state.pop("session_token", None)
+        _sync_session_cookie(None)
+        return
+    st.session_state.logged_in = True
+    st.session_state.username = username
+    st.session_state.session_token = token
+    _sync_session_cookie(token)
+
 def login():
     """Professional, clean login system with registration"""
     st.markdown(
@@ -95,6 +300,12 @@ def login():
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
 
+    if SESSION_PARAM in st.query_params:
+        del st.query_params[SESSION_PARAM]
+
+    if st.session_state.logged_in or SESSION_COOKIE in st.context.cookies:
+        restore_session()
+
     if "show_register" not in st.session_state:
         st.session_state.show_register = False
 
@@ -119,8 +330,7 @@ def login():
                 if st.button("Login"):
                     if username and password:
                         if verify_user(username, password):
-                            st.session_state.logged_in = True
-                            st.session_state.username = username
+                            start_session(username)
                             st.success("Login successful!")
                             st.rerun()
                         else:
@@ -183,7 +393,8 @@ def login():
 
 def logout():
     """Logout function"""
-    for key in ["logged_in", "username", "show_register"]:
+    revoke_session_token(st.session_state.get("session_token"))
+    for key in ["logged_in", "username", "show_register", "session_token"]:
         if key in st.session_state:
             del st.session_state[key]
     st.rerun()
@@ -0,0 +1,231 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import numpy as np
+
+# Every on-disk cache points at a scratch directory so each run starts cold.
+# This happens before the pipeline modules are imported; spawned pool workers
+# re-import this module and inherit the parent's directory through the environment.
+if "CRIMESCAN_BENCH_SCRATCH" not in os.environ:
+    os.environ["CRIMESCAN_BENCH_SCRATCH"] = tempfile.mkdtemp(prefix="crimescan-bench-")
+SCRATCH_DIR = os.environ["CRIMESCAN_BENCH_SCRATCH"]
+for name, sub in [("CRIMESCAN_STORE_DIR", "store"), ("CRIMESCAN_MODEL_CACHE_DIR", "models"),
+                  ("CRIMESCAN_CHART_CACHE_DIR", "charts"), ("CRIMESCAN_GEOCODE_CACHE", "geocode.sqlite")]:
+    os.environ[name] = os.path.join(SCRATCH_DIR, sub)
+
+from synthetic_data import generate
+from data_loader import file_hash, load_clean_dataset, parse_csv, DATE_COL
+from dataset_store import store_key
+from dataset_registry import get_registry
+from metrics import compute_metrics, report_summary
+from aggregate_cube import AggregateCube, AREA
+from hotspots import cluster_labels, summarize_clusters
+from districts import Boundaries, join_points
+from map_builder import build_hotspot_map
+from forecasting import batch_forecast
+from report_generator import render_pdf_report, report_images, zone_table
+from perf import timed_import
+
+# Stored timings and peak memory that runs are compared against
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# A stage regresses when it is this much slower (or bigger) than the baseline...
+TOLERANCE = 0.25
+
+# ...and also by more than these absolute margins, which absorb timer noise on fast stages
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 5.0
+
+# Row counts benchmarked when none are given
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# Locations forecast in the batch-forecast stage (longest series first)
+FORECAST_GROUPS = 20
+
+# Rectangular districts per side of the grid joined in the districts stage
+DISTRICT_GRID = 30
+
+# Modules the pipeline imports lazily; loaded up front so no stage is charged for them
+LAZY_MODULES = ("sklearn.neighbors", "scipy.sparse.csgraph", "scipy.stats", "statsmodels.tsa.statespace.sarimax", "charts", "shapely")
+
+COL_AREA = 'Area_Name'
+COL_CASES = 'Cases_Property_Stolen'
+
+
+def reset_caches():
+    """Empty every in-memory and on-disk cache so the next pass does the full work"""
+    get_registry().clear()
+    parse_csv.clear()
+    for entry in os.listdir(SCRATCH_DIR):
+        path = os.path.join(SCRATCH_DIR, entry)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def measure(stage, results, traced, func, *args, **kwargs):
+    """Run one stage, recording its wall time, or its peak traced memory when `traced`.
+
+    tracemalloc slows allocation-heavy code many times over, so time and
+    memory are measured in separate passes.
+    """
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    figures = results.setdefault(stage, {})
+    if traced:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        figures['peak_mb'] = round(peak / 2**20, 2)
+    else:
+        figures['seconds'] = round(seconds, 4)
+    return value
+
+
+def grid_boundaries(df, cells=DISTRICT_GRID):
+    """GeoJSON of a cells x cells grid of rectangular districts covering the dataset"""
+    shapely = timed_import('shapely')
+    lons = np.linspace(df['Longitude'].min() - 0.1, df['Longitude'].max() + 0.1, cells + 1)
+    lats = np.linspace(df['Latitude'].min() - 0.1, df['Latitude'].max() + 0.1, cells + 1)
+    features = [
+        {'type': 'Feature', 'properties': {'name': f"District {i}-{j}"},
+         'geometry': shapely.geometry.mapping(shapely.box(lons[i], lats[j], lons[i + 1], lats[j + 1]))}
+        for i in range(cells) for j in range(cells)
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def run_pipeline(n_rows, seed=0, memory=True):
+    """Benchmark every pipeline stage on a synthetic dataset of n_rows.
+
+    Returns {stage: {'seconds': ..., 'peak_mb': ...}}. Each pass starts from
+    empty caches; peak memory (Python allocations, including NumPy and pandas
+    buffers, in this process only) comes from a second, traced pass.
+    """
+    results = {}
+    data = generate(n_rows, seed=seed, dates=True).to_csv(index=False).encode()
+    for traced in ([False, True] if memory else [False]):
+        reset_caches()
+        run_stages(data, results, traced)
+    return results
+
+
+def run_stages(data, results, traced):
+    """One pass over the pipeline: ingest, metrics, cube, resample, hotspots, districts, map, forecast, PDF"""
+    content_hash = file_hash(data)
+    dataset_key = store_key(content_hash, COL_AREA, COL_CASES, 'Severity', DATE_COL)
+
+    df = measure('ingest', results, traced, load_clean_dataset, content_hash, data, COL_AREA, COL_CASES,
+                 'Severity', DATE_COL)
+    metrics = measure('metrics', results, traced, compute_metrics, df, COL_AREA)
+    cube = measure('cube', results, traced, AggregateCube.from_frame, df, COL_AREA)
+
+    def resample():
+        return AggregateCube.from_frame(df, COL_AREA, granularity='D').matrix(AREA)
+    measure('resample', results, traced, resample)
+
+    def hotspots():
+        labels = cluster_labels(df, 25, 50)
+        return summarize_clusters(df, COL_AREA, labels)
+    clusters = measure('hotspots', results, traced, hotspots)
+
+    geojson = grid_boundaries(df)
+    measure('districts', results, traced, lambda: join_points(df, Boundaries(geojson, 'grid')))
+
+    def hotspot_map():
+        return build_hotspot_map(df, COL_AREA, clusters, 25).get_root().render()
+    measure('map', results, traced, hotspot_map)
+
+    matrix = cube.matrix(AREA)
+    matrix = matrix.loc[matrix.notna().sum(axis=1).sort_values(ascending=False).index[:FORECAST_GROUPS]]
+    measure('forecast', results, traced, batch_forecast, matrix)
+
+    def pdf_export():
+        top = metrics['top_zones']
+        trends = [(location, cube.location_series(location)) for location in top[COL_AREA].unique()[:3]]
+        images = report_images(dataset_key, df, trends, clusters, (25, 50))
+        return render_pdf_report(report_summary(metrics), zone_table(top, COL_AREA), images=images)
+    measure('pdf', results, traced, pdf_export)
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Describe every stage whose time or peak memory exceeds its baseline"""
+    failures = []
+    for size, stages in results.items():
+        for stage, figures in stages.items():
+            expected = baseline.get(size, {}).get(stage)
+            if expected is None:
+                continue
+            for metric, min_delta, unit in [('seconds', MIN_SECONDS_DELTA, 's'), ('peak_mb', MIN_MEMORY_DELTA_MB, ' MB')]:
+                if metric not in figures or metric not in expected:
+                    continue
+                limit = max(expected[metric] * (1 + tolerance), expected[metric] + min_delta)
+                if figures[metric] > limit:
+                    failures.append(f"{size} rows / {stage}: {metric} {figures[metric]}{unit} "
+                                    f"exceeds baseline {expected[metric]}{unit} (limit {limit:.2f}{unit})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CrimeScan pipeline on synthetic data")
+    parser.add_argument("sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="row counts to benchmark")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory pass")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    # Streamlit caches warn about the missing runtime on every call
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    warnings.filterwarnings('ignore')
+    for name in LAZY_MODULES:
+        timed_import(name)
+
+    results = {}
+    try:
+        for n_rows in args.sizes:
+            results[str(n_rows)] = stages = run_pipeline(n_rows, memory=not args.no_memory)
+            for stage, figures in stages.items():
+                memory = f"{figures['peak_mb']:>9.1f} MB" if 'peak_mb' in figures else ""
+                print(f"{n_rows:>10,} rows  {stage:<9} {figures['seconds']:>9.3f} s  {memory}")
+    finally:
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        failures = regressions(results, json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
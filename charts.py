@@ -0,0 +1,192 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import streamlit as st
+import pandas as pd
+import numpy as np
+import hashlib
+import io
+import os
+import threading
+from heat_pyramid import build_heat_pyramid
+
+# Directory holding rendered report charts
+CHART_CACHE_DIR = os.environ.get("CRIMESCAN_CHART_CACHE_DIR", ".crimescan_charts")
+
+# Number of cached chart images kept before the least recently used are evicted
+MAX_CACHED_CHARTS = int(os.environ.get("CRIMESCAN_CHART_CACHE_SIZE", "1000"))
+
+# Bump when the chart styling or the plotted data changes so stale images are not reused
+CHART_VERSION = 2
+
+# Zoom level of the heat pyramid used for the static hotspot map
+MAP_ZOOM = 6
+
+# Number of hotspot clusters labelled on the static map
+MAP_LABELLED_CLUSTERS = 5
+
+
+def chart_key(dataset_key, chart, *params):
+    """Cache key for a chart of a dataset with the given parameters"""
+    raw = "\0".join(str(part) for part in (CHART_VERSION, dataset_key, chart) + params)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _evict(max_entries):
+    """Drop the least recently used chart images beyond max_entries"""
+    entries = []
+    for name in os.listdir(CHART_CACHE_DIR):
+        if name.endswith(".png"):
+            path = os.path.join(CHART_CACHE_DIR, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+    for _, path in sorted(entries)[:max(len(entries) - max_entries, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached_chart(key, draw, figsize=(8, 4.5), dpi=110):
+    """Return the path of a cached PNG, drawing it headlessly with Agg on a miss.
+
+    Returns None when the chart could not be written to the cache directory.
+
+    `draw` receives a fresh matplotlib Figure; no pyplot state is touched, so
+    charts can be rendered from worker threads and processes.
+    """
+    path = os.path.join(CHART_CACHE_DIR, f"{key}.png")
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    draw(fig)
+    # Unique per process and thread, as report workers may draw the same chart at once
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+    try:
+        fig.savefig(tmp_path, format="png", bbox_inches="tight")
+        os.replace(tmp_path, path)
+    except Exception:
+        # The cache is only an accelerator - a report without the chart beats a failed page
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    _evict(MAX_CACHED_CHARTS)
+    return path
+
+
+def hotspot_map_image(dataset_key, df, clusters=None, cluster_params=()):
+    """Static hotspot map from the aggregated heat grid and hotspot centroids.
+
+    `cluster_params` (e.g. eps and min cases) identify the clustering in the cache key.
+    """
+    def draw(fig):
+        ax = fig.add_subplot()
+        points = build_heat_pyramid(df['Latitude'], df['Longitude'], df['cases'],
+                                    zoom_levels=(MAP_ZOOM,))[MAP_ZOOM]
+        if len(points):
+            order = np.argsort(points[:, 2])
+            ax.scatter(points[order, 1], points[order, 0], c=points[order, 2], s=10 + 120 * points[order, 2],
+                       cmap="YlOrRd", vmin=0, vmax=1, alpha=0.8, edgecolors="none")
+            mean_lat = float(np.mean(points[:, 0]))
+            ax.set_aspect(1 / max(np.cos(np.radians(mean_lat)), 0.1))
+
+        if clusters is not None and not clusters.empty:
+            top = clusters[~clusters['isolated']].head(MAP_LABELLED_CLUSTERS)
+            ax.scatter(top['Longitude'], top['Latitude'], marker="x", s=80, color="#0d47a1")
+            for _, row in top.iterrows():
+                ax.annotate(str(row['location']), (row['Longitude'], row['Latitude']),
+                            xytext=(5, 5), textcoords="offset points", fontsize=8)
+
+        ax.set_title("Crime Hotspot Map", fontsize=13)
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        ax.grid(True, alpha=0.3)
+
+    key = chart_key(dataset_key, "hotspot_map", MAP_ZOOM, MAP_LABELLED_CLUSTERS,
+                    clusters is not None, *cluster_params)
+    return cached_chart(key, draw, figsize=(8, 6))
+
+
+def trend_chart_image(dataset_key, label, series):
+    """Yearly trend chart for one location or crime type"""
+    def draw(fig):
+        ax = fig.add_subplot()
+        mean = series.mean()
+        ax.bar(series.index.astype(str), series.values,
+               color=['#e74c3c' if val > mean else '#3498db' for val in series.values])
+        ax.axhline(mean, color='#2c3e50', linestyle='--', label='Mean Cases')
+        ax.set_title(f"Crime Trend in {label}", fontsize=13)
+        ax.set_xlabel("Year")
+        ax.set_ylabel("Reported Cases")
+        ax.grid(True, axis="y", alpha=0.3)
+        ax.legend()
+
+    return cached_chart(chart_key(dataset_key, "trend", label), draw)
+
+
+def figure_png(fig, dpi=200):
+    """PNG bytes of a figure, rendered the way st.pyplot would"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+# Dashboard charts are cached as PNG bytes, not Figures: a cached Figure is one
+# mutable object shared by every session, and drawing it is not thread-safe
+@st.cache_data(show_spinner=False, max_entries=64)
+def forecast_chart(dataset_key, label, period_label, _history, _predicted):
+    """PNG of a location's cases per period with its forecast overlaid"""
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    # x_compat keeps dated axes in plain matplotlib date units, so the span below lines up
+    _history.plot(ax=ax, label='Historical Data', linewidth=2.5, color='#3498db', x_compat=True)
+    _predicted.plot(ax=ax, style='r--', label=f'1-{period_label} Forecast', linewidth=2.5, x_compat=True)
+
+    # Highlight if predicted increase
+    if _predicted.iloc[0] > _history.mean():
+        ax.axvspan(_history.index[-1], _predicted.index[0], facecolor='#ffcccc', alpha=0.3)
+        ax.annotate('Projected Increase',
+                    xy=(_predicted.index[0], _predicted.iloc[0]),
+                    xytext=(10, 10), textcoords='offset points',
+                    bbox=dict(boxstyle='round,pad=0.5', fc='red', alpha=0.1),
+                    arrowprops=dict(arrowstyle='->'))
+
+    ax.set_title(f"Crime Trend in {label}", pad=20, fontsize=14)
+    ax.set_xlabel(period_label, labelpad=10)
+    ax.set_ylabel("Reported Cases", labelpad=10)
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    return figure_png(fig)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def crime_trend_chart(dataset_key, label, period_label, _series):
+    """PNG of a crime type's cases per period against their mean.
+
+    Yearly series are drawn as bars; daily, weekly and monthly series, which
+    can run to thousands of periods, as a line.
+    """
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    mean = _series.mean()
+    if isinstance(_series.index, pd.DatetimeIndex):
+        _series.plot(ax=ax, color='#3498db', linewidth=1.5, x_compat=True)
+    else:
+        _series.plot(kind='bar', ax=ax,
+                     color=['#e74c3c' if val > mean else '#3498db' for val in _series])
+    ax.axhline(mean, color='#2c3e50', linestyle='--', label='Mean')
+    ax.set_title(f"Trend for {label}", pad=20, fontsize=14)
+    ax.set_xlabel(period_label, labelpad=10)
+    ax.set_ylabel("Reported Cases", labelpad=10)
+    ax.legend(["Mean Cases", label])
+    return figure_png(fig)
@@ -0,0 +1,346 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from pandas.api.types import union_categoricals
+import dataset_store
+from dataset_registry import get_registry
+from geocoder import geocode_areas
+from perf import timed
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import codecs
+import io
+import os
+
+# Encodings tried, in order, when reading a CSV file
+ENCODINGS = ['utf-8', 'latin1', 'utf-16', 'iso-8859-1', 'cp1252']
+
+# Number of leading bytes used to sniff the encoding
+SAMPLE_SIZE = 64 * 1024
+
+# Files larger than this are ingested in chunks with compact dtypes
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("CRIMESCAN_STREAMING_MB", "100")) * 1024 * 1024
+
+# Rows per chunk in streaming mode
+CHUNK_ROWS = 250_000
+
+# Accepted header names per canonical column, in order of preference; the
+# first name is the canonical one used when several files are combined
+COLUMN_CANDIDATES = {
+    'Area_Name': ['Area_Name', 'Location', 'District'],
+    'Cases_Property_Stolen': ['Cases_Property_Stolen', 'Cases', 'Count'],
+    'Year': ['Year'],
+    'Group_Name': ['Group_Name', 'Crime_Type', 'Crime'],
+    'Latitude': ['Latitude', 'Lat'],
+    'Longitude': ['Longitude', 'Lon', 'Lng'],
+    'Severity': ['Severity'],
+    'Date': ['Date', 'Datetime', 'Timestamp', 'Incident_Date', 'Occurred_At', 'Reported_Date'],
+}
+
+# Column naming the file each row came from when several files are combined
+SOURCE_COL = 'Source'
+
+# Column holding the parsed incident timestamps in cleaned frames
+DATE_COL = 'Date'
+
+
+def file_hash(data):
+    """Return the SHA-256 content hash of raw file bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def detect_encoding(sample):
+    """Detect the encoding of a CSV file from a leading byte sample"""
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+
+    for encoding in ENCODINGS:
+        # Incremental decoding tolerates a multi-byte character cut off at the end of the sample
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def read_csv_bytes(data, encoding=None, **kwargs):
+    """Parse CSV bytes, detecting the encoding from a sample if not given.
+
+    Returns the DataFrame and the encoding that was used. The file is parsed
+    once; the remaining encodings are only tried if the sample was misleading.
+    """
+    for enc in _encoding_candidates(data, encoding):
+        try:
+            return pd.read_csv(io.BytesIO(data), encoding=enc, **kwargs), enc
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Failed to read file. Please convert to UTF-8.")
+
+
+def _encoding_candidates(data, encoding=None):
+    """Detected (or given) encoding first, then the remaining fallbacks"""
+    detected = encoding or detect_encoding(data[:SAMPLE_SIZE])
+    candidates = [detected] if detected else []
+    return candidates + [enc for enc in ENCODINGS if enc not in candidates]
+
+
+def read_csv_columns(data):
+    """Read only the header row of CSV bytes, returning (columns, encoding)"""
+    header, encoding = read_csv_bytes(data, nrows=0)
+    return header.columns.tolist(), encoding
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+@timed("parse_csv")
+def parse_csv(content_hash, _data):
+    """Memoized parse keyed only by the content hash (the bytes are not re-hashed)"""
+    return read_csv_bytes(_data)
+
+
+def parse_dates(values):
+    """Parse a column of timestamps into naive datetime64; unparseable values become NaT.
+
+    The format is inferred from the first value and applied to the whole
+    column in one vectorized pass; only values that do not match it are
+    parsed again one by one. Values with a UTC offset are converted to UTC
+    (parsing as UTC keeps a column with mixed offsets datetime64 instead of
+    object); values without one are kept as they are.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        dates = pd.to_datetime(values, errors='coerce', utc=True)
+        missed = dates.isna() & values.notna()
+        if missed.any():
+            dates[missed] = pd.to_datetime(values[missed], errors='coerce', format='mixed', utc=True)
+        values = dates
+    if getattr(values.dt, 'tz', None) is not None:
+        values = values.dt.tz_convert(None)
+    return values
+
+
+@timed("clean_dataset")
+def clean_dataset(df, col_area, col_cases, severity_col, date_col=None):
+    """Normalize cases, drop unusable rows, derive Severity and fill coordinates.
+
+    With `col_cases` None every row counts as one incident. With `date_col`
+    the timestamps are parsed once into DATE_COL (rows without a valid date
+    are dropped) and Year is derived from them when the file has none. Area
+    names that could not be geocoded are listed in df.attrs['unresolved_areas'].
+    """
+    df = df.copy()
+
+    # Handle cases
+    if col_cases is None:
+        df['cases'] = 1
+    else:
+        df['cases'] = pd.to_numeric(df[col_cases], errors='coerce').fillna(0)
+        df = df[df['cases'] > 0]  # Remove rows with 0 cases
+
+    if date_col is not None:
+        df[DATE_COL] = parse_dates(df[date_col])
+        df = df[df[DATE_COL].notna()]
+        if 'Year' not in df.columns:
+            df['Year'] = df[DATE_COL].dt.year
+
+    # Calculate severity if not provided
+    if severity_col is None:
+        df['Severity'] = pd.cut(df['cases'],
+                              bins=[0, 10, 20, 30, 40, float('inf')],
+                              labels=[1, 2, 3, 4, 5]).astype(int)
+
+    # Geocode locations when the file has no coordinates; unknown places are dropped
+    if 'Latitude' not in df.columns or 'Longitude' not in df.columns:
+        df['Latitude'], df['Longitude'], unresolved = geocode_areas(df[col_area])
+        df.attrs['unresolved_areas'] = unresolved
+
+    return df.dropna(subset=['Latitude', 'Longitude'])
+
+
+def compact_frame(df, col_area):
+    """Downcast a cleaned frame: categorical labels, float32 coordinates, small ints"""
+    for col in dict.fromkeys([col_area, 'Group_Name']):
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype('category')
+
+    for col in ['Latitude', 'Longitude']:
+        df[col] = df[col].astype('float32')
+
+    for col in ['Severity', 'Year']:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and df[col].notna().all():
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def concat_compact(frames, ignore_index=False):
+    """Concatenate compact chunks, unifying categories so labels stay categorical"""
+    for col in frames[0].select_dtypes('category').columns:
+        if not all(col in frame.columns and frame[col].dtype == 'category' for frame in frames):
+            continue
+        categories = union_categoricals([frame[col] for frame in frames]).categories
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    df = pd.concat(frames, ignore_index=ignore_index)
+
+    unresolved = set()
+    for frame in frames:
+        unresolved.update(frame.attrs.get('unresolved_areas', []))
+    if unresolved:
+        df.attrs['unresolved_areas'] = sorted(unresolved)
+    return df
+
+
+@timed("parse_csv_chunked")
+def read_csv_chunked(data, col_area, col_cases, severity_col, date_col=None, chunk_rows=CHUNK_ROWS):
+    """Stream-parse CSV bytes chunk by chunk into a compact cleaned frame.
+
+    Each chunk is cleaned (zero-case and coordinate-less rows dropped) and
+    downcast before the next one is read, so peak memory stays close to the
+    size of the final frame rather than the raw file.
+    """
+    for enc in _encoding_candidates(data):
+        try:
+            reader = pd.read_csv(io.BytesIO(data), encoding=enc, chunksize=chunk_rows)
+            chunks = [compact_frame(clean_dataset(chunk, col_area, col_cases, severity_col, date_col), col_area)
+                      for chunk in reader]
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError("Failed to read file. Please convert to UTF-8.")
+
+    if not chunks:
+        header, _ = read_csv_bytes(data, nrows=0)
+        return compact_frame(clean_dataset(header, col_area, col_cases, severity_col, date_col), col_area)
+    return concat_compact(chunks)
+
+
+def load_clean_dataset(content_hash, data, col_area, col_cases, severity_col, date_col=None, streaming=None):
+    """Return the cleaned dataset for CSV bytes, using the on-disk Parquet store.
+
+    The first load parses and cleans the file and writes the result to the
+    store; later loads with the same content and column mapping read the
+    stored frame instead of touching the CSV. The frame is held once in the
+    process-wide dataset registry and must not be modified by callers. Files above
+    STREAMING_THRESHOLD_BYTES are ingested in chunks unless streaming is
+    set explicitly.
+    """
+    if streaming is None:
+        streaming = len(data) > STREAMING_THRESHOLD_BYTES
+
+    key = dataset_store.store_key(content_hash, col_area, col_cases, severity_col, date_col, streaming)
+
+    def build():
+        df = dataset_store.load_frame(key)
+        if df is None:
+            if streaming:
+                df = read_csv_chunked(data, col_area, col_cases, severity_col, date_col)
+            else:
+                raw, _ = parse_csv(content_hash, data)
+                df = clean_dataset(raw, col_area, col_cases, severity_col, date_col)
+            dataset_store.save_frame(key, df)
+        return df
+
+    # One shared in-memory copy per content hash across all sessions
+    return get_registry().get_or_create(('dataset', key), build)
+
+
+def find_col(columns, possible_names):
+    """First of possible_names present in columns, else the first column"""
+    for name in possible_names:
+        if name in columns:
+            return name
+    return columns[0]
+
+
+def column_mapping(columns):
+    """Rename map from a file's headers to the canonical column names"""
+    mapping = {}
+    for canonical, candidates in COLUMN_CANDIDATES.items():
+        for name in candidates:
+            if name in columns and name not in mapping:
+                mapping[name] = canonical
+                break
+    return mapping
+
+
+def unified_columns(headers):
+    """Selectable column names of the combined frame for a list of per-file header lists.
+
+    SOURCE_COL is left out: it is added while loading, so it cannot be picked
+    as an input column (and would be overwritten if a file had one).
+    """
+    columns = {}
+    for header in headers:
+        mapping = column_mapping(header)
+        for name in header:
+            columns.setdefault(mapping.get(name, name), None)
+    return [name for name in columns if name != SOURCE_COL]
+
+
+def _load_source(source, col_area, col_cases, severity_col, date_col=None):
+    """Parse, rename, clean and compact one file of a multi-file load"""
+    name, data = source
+    raw, _ = read_csv_bytes(data)
+    raw = raw.rename(columns=column_mapping(raw.columns.tolist()))
+    # Files without the chosen severity column get it derived from cases
+    severity = severity_col if severity_col in raw.columns else None
+    df = compact_frame(clean_dataset(raw, col_area, col_cases, severity, date_col), col_area)
+    df[SOURCE_COL] = pd.Categorical.from_codes(np.zeros(len(df), dtype='int8'), categories=[name])
+    return df
+
+
+@timed("load_sources")
+def load_sources(sources, col_area, col_cases, severity_col, date_col=None, max_workers=None):
+    """Combine several CSV files into one compact cleaned frame.
+
+    `sources` is a list of (name, bytes). Each file is parsed, mapped onto the
+    canonical column names with the same candidate lists as the single-file
+    column auto-detection, cleaned and downcast on a thread pool. Only part of
+    that overlaps: the C CSV parser releases the GIL while tokenizing, while
+    the cleaning steps mostly hold it. The results are concatenated once,
+    with a SOURCE_COL column naming each row's file.
+    """
+    workers = min(len(sources), max_workers or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        frames = list(pool.map(lambda source: _load_source(source, col_area, col_cases, severity_col, date_col), sources))
+    # Row labels restart in every file
+    return concat_compact(frames, ignore_index=True)
+
+
+def sources_hash(sources, hashes=None):
+    """Content hash identifying a set of (name, bytes) files.
+
+    `hashes` are the files' own content hashes, when the caller already has them.
+    """
+    if hashes is None:
+        hashes = [file_hash(data) for _, data in sources]
+    digest = hashlib.sha256()
+    for name, data_hash in sorted(zip((name for name, _ in sources), hashes)):
+        digest.update(name.encode() + b"\0" + data_hash.encode())
+    return digest.hexdigest()
+
+
+def load_clean_sources(content_hash, sources, col_area, col_cases, severity_col, date_col=None):
+    """Combined cleaned frame for several files, through the Parquet store and registry"""
+    key = dataset_store.store_key(content_hash, col_area, col_cases, severity_col, date_col, 'multi')
+
+    def build():
+        df = dataset_store.load_frame(key)
+        if df is None:
+            df = load_sources(sources, col_area, col_cases, severity_col, date_col)
+            dataset_store.save_frame(key, df)
+        return df
+
+    return get_registry().get_or_create(('dataset', key), build)
+
+
+def read_directory(directory, pattern=".csv"):
+    """(name, bytes) for every CSV file in a directory, sorted by name"""
+    sources = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(pattern) and os.path.isfile(path):
+            with open(path, "rb") as f:
+                sources.append((name, f.read()))
+    return sources
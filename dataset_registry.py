@@ -0,0 +1,161 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import threading
+import sys
+import os
+from collections import OrderedDict
+
+# Memory the registry may hold before the least recently used entries are evicted
+MAX_REGISTRY_BYTES = int(os.environ.get("CRIMESCAN_REGISTRY_MB", "2048")) * 1024 * 1024
+
+
+def estimate_bytes(value, _seen=None):
+    """Approximate in-memory size of a frame, array, container or plain object"""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k, seen) + estimate_bytes(v, seen)
+                                          for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item, seen) for item in value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_bytes(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+def freeze(value, _seen=None):
+    """Mark the numeric NumPy arrays behind a frame, array, container or plain object read-only.
+
+    Writes into a frozen frame's existing values (e.g. `df.loc[...] = x` or an
+    in-place fillna) raise instead of silently changing what every
+    other session sees. Returns value for chaining.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return value
+    seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        for block in value._mgr.blocks:
+            # Extension arrays (categoricals, datetimes) keep their data in _ndarray
+            freeze(getattr(block.values, "_ndarray", block.values), seen)
+    elif isinstance(value, np.ndarray):
+        # Object arrays stay writeable: several pandas kernels (memory_usage among
+        # them) reject read-only object buffers
+        if value.dtype != object:
+            value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            freeze(item, seen)
+    elif hasattr(value, "__dict__"):
+        freeze(vars(value), seen)
+    return value
+
+
+class DatasetRegistry:
+    """Process-wide LRU of cleaned datasets and artifacts derived from them.
+
+    Entries are keyed by content hash (plus whatever parameters shaped them),
+    so every session that opens the same file shares a single copy. Values are
+    frozen on insert (see `freeze`), so callers must copy before modifying
+    them. The total estimated size is kept within `max_bytes` by evicting the
+    least recently used entries.
+    """
+
+    def __init__(self, max_bytes=MAX_REGISTRY_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self._building = {}  # key -> [lock held while that entry is built, sessions using it]
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get_or_create(self, key, build):
+        """Return the entry for key, building it with build() at most once"""
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry[0]
+
+        # Concurrent sessions asking for the same key wait for one build; the
+        # lock is dropped only once no session holds or waits on it, so a late
+        # arrival can never start a second build under a fresh lock
+        with self._lock:
+            building = self._building.setdefault(key, [threading.Lock(), 0])
+            building[1] += 1
+        try:
+            with building[0]:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry[0]
+                value = build()
+                self._insert(key, value)
+                return value
+        finally:
+            with self._lock:
+                building[1] -= 1
+                if building[1] == 0:
+                    del self._building[key]
+
+    def _insert(self, key, value):
+        freeze(value)
+        nbytes = estimate_bytes(value)
+        with self._lock:
+            self.misses += 1
+            # Anything larger than the whole budget is handed back uncached
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def usage(self):
+        """Memory and hit-rate figures, plus (kind, bytes) for every entry, most recent first"""
+        with self._lock:
+            entries = [(key[0] if isinstance(key, tuple) else str(key), nbytes)
+                       for key, (_, nbytes) in reversed(self._entries.items())]
+            return {
+                'entries': len(entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'items': entries
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_registry():
+    """The registry shared by every session in this server process"""
+    return DatasetRegistry()
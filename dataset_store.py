@@ -0,0 +1,89 @@
+import pyarrow.parquet as pq
+import hashlib
+import os
+import threading
+
+# Directory holding cleaned datasets as Parquet files
+STORE_DIR = os.environ.get("CRIMESCAN_STORE_DIR", ".crimescan_store")
+
+# Total size the store may grow to before the least recently used files are evicted
+MAX_STORE_BYTES = int(os.environ.get("CRIMESCAN_STORE_MAX_MB", "1024")) * 1024 * 1024
+
+# Bump when the cleaning logic changes so stale entries are not reused
+STORE_VERSION = 2
+
+
+def store_key(*parts):
+    """Build a store key from the dataset hash and the cleaning parameters"""
+    raw = "\0".join(str(part) for part in (STORE_VERSION,) + parts)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _path(key):
+    return os.path.join(STORE_DIR, f"{key}.parquet")
+
+
+def load_frame(key):
+    """Load a stored frame (memory-mapped), or None if it is not in the store"""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pq.read_table(path, memory_map=True).to_pandas()
+    except Exception:
+        # Corrupt or partially written entry - drop it and rebuild
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    # Touch the file so eviction sees it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return df
+
+
+def save_frame(key, df):
+    """Write a frame to the store and evict old entries over the size budget"""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    path = _path(key)
+    # Unique per process and thread, as sessions may store the same dataset at once
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(tmp_path, index=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        # The store is only an accelerator - never fail the page because of it
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    evict(MAX_STORE_BYTES)
+
+
+def evict(max_bytes):
+    """Remove least recently used entries until the store fits in max_bytes"""
+    if not os.path.isdir(STORE_DIR):
+        return
+    entries = []
+    for name in os.listdir(STORE_DIR):
+        if not name.endswith(".parquet"):
+            continue
+        path = os.path.join(STORE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
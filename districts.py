@@ -0,0 +1,123 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import json
+import os
+from dataset_registry import get_registry
+from perf import timed_import, timed
+
+# GeoJSON of district or ward boundaries used when none is uploaded (optional)
+BOUNDARIES_FILE = os.environ.get("CRIMESCAN_BOUNDARIES_FILE")
+
+# Feature properties tried, case-insensitively and in order, for a boundary's name
+NAME_PROPERTIES = ['district', 'dtname', 'district_name', 'ward', 'ward_name', 'name', 'name_2', 'name_1']
+
+# Column naming each polygon in district summaries
+DISTRICT_COL = 'District'
+
+
+def name_property(features):
+    """The feature property holding boundary names, or None if no candidate is present"""
+    keys = {}
+    for feature in features:
+        for key in (feature.get('properties') or {}):
+            keys.setdefault(key.lower(), key)
+    for name in NAME_PROPERTIES:
+        if name in keys:
+            return keys[name]
+    return None
+
+
+class Boundaries:
+    """District polygons from a GeoJSON FeatureCollection, indexed by an STRtree.
+
+    Points are joined to polygons in bulk: the tree query and the
+    point-in-polygon tests run inside GEOS over whole arrays, so there is no
+    per-point Python call.
+    """
+
+    def __init__(self, geojson, key=None):
+        shapely = timed_import('shapely')
+        self.key = key
+        self.features = [feature for feature in geojson.get('features', []) if feature.get('geometry')]
+        if not self.features:
+            raise ValueError("The boundary file has no polygon features")
+        prop = name_property(self.features)
+        self.names = []
+        for i, feature in enumerate(self.features):
+            name = (feature.get('properties') or {}).get(prop) if prop else None
+            self.names.append(str(name) if name not in (None, '') else f"Area {i + 1}")
+        self.polygons = np.array([shapely.geometry.shape(feature['geometry']) for feature in self.features])
+        shapely.prepare(self.polygons)
+        self.tree = shapely.STRtree(self.polygons)
+
+    def assign(self, lat, lon):
+        """Index of the polygon containing each point, or -1 for points outside every polygon.
+
+        Only distinct coordinate pairs are queried; rows repeating a location
+        (common when coordinates come from area names) share one lookup. A
+        point on a shared border goes to the first polygon in file order.
+        """
+        shapely = timed_import('shapely')
+        # Each pair hashed as one complex number: a single O(n) factorize
+        inverse, pairs = pd.factorize(np.asarray(lon, dtype=float) + 1j * np.asarray(lat, dtype=float))
+
+        point_idx, polygon_idx = self.tree.query(shapely.points(pairs.real, pairs.imag), predicate='intersects')
+        codes = np.full(len(pairs), -1, dtype=np.int32)
+        # Assign in reverse polygon order so the lowest index wins on borders
+        order = np.argsort(-polygon_idx, kind='stable')
+        codes[point_idx[order]] = polygon_idx[order]
+        return codes[inverse]
+
+    def geojson(self, properties=None):
+        """The boundaries as a FeatureCollection, with extra per-polygon properties merged in.
+
+        `properties` maps a column name to one value per polygon.
+        """
+        properties = properties or {}
+        features = []
+        for i, feature in enumerate(self.features):
+            props = dict(feature.get('properties') or {})
+            props[DISTRICT_COL] = self.names[i]
+            props.update({key: values[i] for key, values in properties.items()})
+            features.append({'type': 'Feature', 'geometry': feature['geometry'], 'properties': props})
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_boundaries(boundaries_key, _data):
+    """Parse a GeoJSON boundary file and build its STRtree, once per content hash"""
+    return Boundaries(json.loads(_data), boundaries_key)
+
+
+def summarize_districts(df, codes, boundaries):
+    """Cases, incidents and high-severity incidents per polygon, plus the unmatched row count"""
+    inside = codes >= 0
+    n = len(boundaries.names)
+    matched = codes[inside]
+    summary = pd.DataFrame({
+        DISTRICT_COL: boundaries.names,
+        'cases': np.bincount(matched, weights=df['cases'].to_numpy(dtype=float)[inside], minlength=n),
+        'incidents': np.bincount(matched, minlength=n),
+        'high_risk': np.bincount(matched, weights=(df['Severity'].to_numpy()[inside] >= 4), minlength=n).astype(int)
+    })
+    summary.attrs['unmatched'] = int((~inside).sum())
+    return summary
+
+
+@timed("district_join")
+def join_points(df, boundaries):
+    """Polygon index of every row (-1 outside all polygons) and the per-polygon summary"""
+    codes = boundaries.assign(df['Latitude'].to_numpy(), df['Longitude'].to_numpy())
+    return codes, summarize_districts(df, codes, boundaries)
+
+
+def join_districts(dataset_key, df, boundaries):
+    """Join a dataset's points to district polygons, cached per dataset and boundary file.
+
+    Returns (codes, summary): the polygon index of every row and one record
+    per polygon with its totals. Results are shared across sessions through
+    the dataset registry.
+    """
+    return get_registry().get_or_create(('districts', dataset_key, boundaries.key),
+                                        lambda: join_points(df, boundaries))
@@ -0,0 +1,296 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import pickle
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from perf import timed_import, timed
+
+# Directory holding fitted SARIMAX forecasts
+MODEL_CACHE_DIR = os.environ.get("CRIMESCAN_MODEL_CACHE_DIR", ".crimescan_models")
+
+# Number of cached models kept before the least recently used are evicted
+MAX_CACHED_MODELS = int(os.environ.get("CRIMESCAN_MODEL_CACHE_SIZE", "512"))
+
+# Series shorter than this use the vectorized linear-trend forecaster instead of SARIMAX
+MIN_SARIMAX_POINTS = 16
+
+# SARIMAX seasonal order per time granularity (see aggregate_cube.GRANULARITIES):
+# weekly cycles in daily data, yearly cycles in weekly and monthly data, none
+# for yearly data. Weekly series skip the seasonal difference: at lag 52 it
+# makes each fit about ten times slower.
+SEASONAL_ORDERS = {'D': (1, 1, 1, 7), 'W': (1, 0, 1, 52), 'M': (1, 1, 1, 12), 'Y': None}
+
+
+def series_fingerprint(series, order, seasonal_order, steps):
+    """Hash a series' index and values together with the model specification"""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(series, index=True).values.tobytes())
+    digest.update(repr((tuple(order), tuple(seasonal_order), steps)).encode())
+    return digest.hexdigest()
+
+
+def seasonal_order_for(granularity, n_points):
+    """Seasonal SARIMAX order for a series of n_points periods at a granularity.
+
+    The seasonal terms are only used when the series covers at least two full
+    seasons (plus the differenced points); otherwise the model is non-seasonal.
+    """
+    seasonal_order = SEASONAL_ORDERS.get(granularity)
+    if seasonal_order and n_points >= 2 * seasonal_order[3] + 2:
+        return seasonal_order
+    return (0, 0, 0, 0)
+
+
+def future_index(index, steps):
+    """Labels for the next `steps` periods after an integer (e.g. Year) or dated index"""
+    if isinstance(index, pd.DatetimeIndex):
+        freq = index.freq or pd.infer_freq(index)
+        return pd.date_range(index[-1], periods=steps + 1, freq=freq, name=index.name)[1:]
+    step = index[-1] - index[-2] if len(index) > 1 else 1
+    return pd.Index([index[-1] + step * (i + 1) for i in range(steps)], name=index.name)
+
+
+def period_positions(index):
+    """Numeric x values of a period index: the labels themselves, or 0..n-1 for dated buckets"""
+    if isinstance(index, pd.DatetimeIndex):
+        return np.arange(len(index), dtype=float)
+    return index.to_numpy(dtype=float)
+
+
+@timed("sarimax_fit")
+def fit_sarimax(series, order, seasonal_order, steps=1):
+    """Fit a SARIMAX model and return its forecast, confidence interval and parameters"""
+    dated = isinstance(series.index, (pd.DatetimeIndex, pd.PeriodIndex))
+
+    # statsmodels only forecasts from date or range indexes, so plain
+    # integer labels such as years are re-attached after fitting
+    endog = series if dated else series.reset_index(drop=True)
+    SARIMAX = timed_import('statsmodels.tsa.statespace.sarimax').SARIMAX
+    results = SARIMAX(endog, order=order, seasonal_order=seasonal_order).fit(disp=False)
+    forecast = results.get_forecast(steps=steps)
+
+    predicted_mean = forecast.predicted_mean
+    conf_int = forecast.conf_int()
+    if not dated:
+        predicted_mean.index = conf_int.index = future_index(series.index, steps)
+    return {
+        'predicted_mean': predicted_mean,
+        'conf_int': conf_int,
+        'params': results.params
+    }
+
+
+def _cache_path(key):
+    return os.path.join(MODEL_CACHE_DIR, f"{key}.pkl")
+
+
+def _load_cached(key):
+    path = _cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            result = pickle.load(f)
+    except Exception:
+        return None
+    # Touch the entry so eviction treats it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return result
+
+
+def _save_cached(key, result):
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    # Unique per process and thread, as sessions may fit the same series at once
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    _evict(MAX_CACHED_MODELS)
+
+
+def _evict(max_entries):
+    """Drop the least recently used cached models beyond max_entries"""
+    entries = []
+    for name in os.listdir(MODEL_CACHE_DIR):
+        if name.endswith(".pkl"):
+            path = os.path.join(MODEL_CACHE_DIR, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+    for _, path in sorted(entries)[:max(len(entries) - max_entries, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def sarimax_forecast(series, order=(1, 1, 1), seasonal_order=(0, 0, 0, 0), steps=1):
+    """Forecast a series with SARIMAX, reusing a cached fit for identical inputs.
+
+    Returns a dict with 'predicted_mean', 'conf_int' and 'params'. Fits are
+    keyed by a fingerprint of the series and model order, so switching back
+    to a series that was already analyzed skips the fit entirely.
+    """
+    key = series_fingerprint(series, order, seasonal_order, steps)
+    result = _load_cached(key)
+    if result is None:
+        result = fit_sarimax(series, order, seasonal_order, steps)
+        _save_cached(key, result)
+    return result
+
+
+def linear_trend_forecast(values, periods, steps=1, confidence=0.95):
+    """Fit an OLS linear trend to every row of a 2-D array at once.
+
+    `values` is an (n_series, n_periods) array with NaN for missing points and
+    `periods` the numeric period labels of its columns. Returns arrays
+    (last, predicted, lower, upper, n_points) for the period `steps` after
+    the last column. Prediction intervals are the analytic Student-t bounds;
+    they are NaN for series with fewer than three points, and series with a
+    single point are forecast flat.
+    """
+    values = np.asarray(values, dtype=float)
+    periods = np.asarray(periods, dtype=float)
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+
+    x_mean = np.where(mask, periods, 0.0).sum(axis=1) / safe_n
+    y_mean = np.where(mask, values, 0.0).sum(axis=1) / safe_n
+    dx = np.where(mask, periods - x_mean[:, None], 0.0)
+    dy = np.where(mask, values - y_mean[:, None], 0.0)
+    sxx = (dx ** 2).sum(axis=1)
+    slope = np.divide((dx * dy).sum(axis=1), sxx, out=np.zeros_like(sxx), where=sxx > 0)
+    intercept = y_mean - slope * x_mean
+
+    step = periods[-1] - periods[-2] if len(periods) > 1 else 1.0
+    x_next = periods[-1] + step * steps
+    predicted = intercept + slope * x_next
+
+    residuals = np.where(mask, values - (intercept[:, None] + slope[:, None] * periods), 0.0)
+    dof = n - 2
+    valid = (dof > 0) & (sxx > 0)
+    safe_dof = np.where(valid, dof, 1)
+    sigma2 = (residuals ** 2).sum(axis=1) / safe_dof
+    se = np.sqrt(sigma2 * (1 + 1 / safe_n + (x_next - x_mean) ** 2 / np.where(valid, sxx, 1.0)))
+    stats = timed_import('scipy.stats')
+    margin = np.where(valid, stats.t.ppf((1 + confidence) / 2, safe_dof) * se, np.nan)
+
+    # Last observed value of every row
+    last_idx = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    last = np.where(n > 0, values[np.arange(len(values)), last_idx], np.nan)
+    predicted = np.where(n > 0, predicted, np.nan)
+    return last, predicted, predicted - margin, predicted + margin, n
+
+
+def trend_forecast(series, steps=1):
+    """Forecast a single series with the linear-trend model, in sarimax_forecast's format"""
+    _, predicted, lower, upper, _ = linear_trend_forecast(
+        series.to_numpy(dtype=float)[None, :], period_positions(series.index), steps)
+    index = future_index(series.index, steps)[-1:]
+    return {
+        'predicted_mean': pd.Series(predicted, index=index),
+        'conf_int': pd.DataFrame({'lower cases': lower, 'upper cases': upper}, index=index)
+    }
+
+
+def forecast_series(series, order=(1, 1, 1), seasonal_order=None, granularity='Y'):
+    """Forecast the next period, using SARIMAX only when the series is long enough.
+
+    Without an explicit `seasonal_order` the seasonal period follows the
+    series' granularity (weekly seasonality for daily series, and so on).
+    """
+    if len(series) >= MIN_SARIMAX_POINTS:
+        if seasonal_order is None:
+            seasonal_order = seasonal_order_for(granularity, len(series))
+        return sarimax_forecast(series, order, seasonal_order)
+    return trend_forecast(series)
+
+
+def _forecast_chunk(tasks):
+    """Forecast a chunk of (key, series, order, seasonal_order) tasks in a worker process"""
+    rows = []
+    for key, series, order, seasonal_order in tasks:
+        try:
+            result = sarimax_forecast(series, order, seasonal_order)
+            lower, upper = result['conf_int'].iloc[0]
+            rows.append((key, result['predicted_mean'].iloc[0], lower, upper, None))
+        except Exception as e:
+            rows.append((key, np.nan, np.nan, np.nan, str(e)))
+    return rows
+
+
+def _sarimax_pool(tasks, max_workers=None, progress=None):
+    """Run SARIMAX tasks across a process pool, reporting progress per finished chunk"""
+    workers = max_workers or os.cpu_count() or 1
+
+    # A few chunks per worker keeps IPC overhead low while still balancing load
+    chunk_size = max(1, len(tasks) // (workers * 4))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    rows = []
+    if chunks:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            futures = [pool.submit(_forecast_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                rows.extend(future.result())
+                if progress:
+                    progress(len(rows), len(tasks))
+    return rows
+
+
+def batch_forecast(matrix, order=(1, 1, 1), seasonal_order=None, granularity='Y',
+                   max_workers=None, progress=None):
+    """Forecast the next period for every row of a groups x periods case matrix.
+
+    All groups are scored at once by the vectorized linear-trend model; groups
+    with at least MIN_SARIMAX_POINTS periods are then refitted with SARIMAX in
+    a process pool, seasonal per `granularity` unless `seasonal_order` is
+    given. Returns a table with the last observed cases, predicted cases,
+    % change (NaN when the last period had no cases), confidence bounds and
+    the model used per group, sorted by projected change. `progress` is called as progress(done, total).
+    """
+    group_col = matrix.index.name
+    last, predicted, lower, upper, n_points = linear_trend_forecast(
+        matrix.to_numpy(), period_positions(matrix.columns))
+    table = pd.DataFrame({
+        group_col: matrix.index,
+        'last_cases': last,
+        'predicted_cases': predicted,
+        'ci_lower': lower,
+        'ci_upper': upper,
+        'model': 'linear trend',
+        'error': None
+    })
+    table = table[n_points >= 2].set_index(group_col)
+
+    long_keys = matrix.index[n_points >= MIN_SARIMAX_POINTS]
+    tasks = []
+    for key, n in zip(long_keys, n_points[n_points >= MIN_SARIMAX_POINTS]):
+        series = matrix.loc[key].dropna()
+        if isinstance(series.index, pd.DatetimeIndex):
+            # Dated matrices have no gaps; asfreq restores the bucket frequency for statsmodels
+            series = series.asfreq(matrix.columns.freq)
+        tasks.append((key, series, order, seasonal_order or seasonal_order_for(granularity, n)))
+    for key, pred, low, high, error in _sarimax_pool(tasks, max_workers, progress):
+        if error is None:
+            table.loc[key, ['predicted_cases', 'ci_lower', 'ci_upper', 'model']] = [pred, low, high, 'SARIMAX']
+    if progress and not tasks:
+        progress(len(table), len(table))
+
+    # Zero-filled periods make a last count of 0 common; % change from 0 is undefined, not infinite
+    base = table['last_cases'].where(table['last_cases'] != 0)
+    table['change_pct'] = (table['predicted_cases'] - table['last_cases']) / base * 100
+    return table.reset_index().sort_values('change_pct', ascending=False, na_position='last').reset_index(drop=True)
@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+import time
+import os
+from functools import lru_cache
+
+# Offline gazetteer of known places (name, latitude, longitude)
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv")
+
+# Persistent cache of resolved area names
+GEOCODE_CACHE_DB = os.environ.get("CRIMESCAN_GEOCODE_CACHE", ".crimescan_geocode.sqlite")
+
+# Online lookups through Nominatim are opt-in; the gazetteer is always tried first
+ONLINE_GEOCODING = os.environ.get("CRIMESCAN_ONLINE_GEOCODING", "0") == "1"
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_BATCH = 500
+
+
+def normalize_name(name):
+    """Normalize an area name for lookups: lower case, single spaces"""
+    return " ".join(str(name).lower().split())
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """Load the offline gazetteer as a dict of normalized name -> (lat, lon)"""
+    if not os.path.exists(GAZETTEER_FILE):
+        return {}
+    places = pd.read_csv(GAZETTEER_FILE)
+    return {
+        normalize_name(name): (lat, lon)
+        for name, lat, lon in zip(places['name'], places['latitude'], places['longitude'])
+    }
+
+
+def _connect():
+    conn = sqlite3.connect(GEOCODE_CACHE_DB, timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geocode_cache ("
+        "name TEXT PRIMARY KEY, latitude REAL NOT NULL, longitude REAL NOT NULL, source TEXT)"
+    )
+    return conn
+
+
+def _cached_lookup(conn, names):
+    """Fetch cached coordinates for many names in a few batched queries"""
+    found = {}
+    for start in range(0, len(names), _QUERY_BATCH):
+        batch = names[start:start + _QUERY_BATCH]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(
+            f"SELECT name, latitude, longitude FROM geocode_cache WHERE name IN ({placeholders})",
+            batch
+        )
+        found.update((name, (lat, lon)) for name, lat, lon in rows)
+    return found
+
+
+def _gazetteer_lookup(name, gazetteer):
+    """Match the full name, then ever shorter leading word prefixes ("Delhi Central" -> "delhi")"""
+    words = name.split()
+    for end in range(len(words), 0, -1):
+        coords = gazetteer.get(" ".join(words[:end]))
+        if coords is not None:
+            return coords
+    return None
+
+
+def _online_lookup(names):
+    """Resolve names through Nominatim, respecting its one-request-per-second policy"""
+    from geopy.geocoders import Nominatim
+
+    geolocator = Nominatim(user_agent="crimescan")
+    found = {}
+    for name in names:
+        try:
+            location = geolocator.geocode(f"{name}, India", timeout=10)
+        except Exception:
+            location = None
+        if location is not None:
+            found[name] = (location.latitude, location.longitude)
+        time.sleep(1)
+    return found
+
+
+def resolve_names(names, online=ONLINE_GEOCODING):
+    """Resolve unique area names to coordinates.
+
+    Lookups go through the on-disk cache, then the offline gazetteer, then
+    (if enabled) Nominatim. New resolutions are written back to the cache.
+    Returns (coords, unresolved): a dict of normalized name -> (lat, lon)
+    and the sorted list of names that could not be resolved.
+    """
+    names = sorted({normalize_name(name) for name in names})
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        conn = None
+
+    coords = _cached_lookup(conn, names) if conn is not None else {}
+    missing = [name for name in names if name not in coords]
+
+    resolved = {}
+    gazetteer = load_gazetteer()
+    for name in missing:
+        match = _gazetteer_lookup(name, gazetteer)
+        if match is not None:
+            resolved[name] = (match, "gazetteer")
+
+    still_missing = [name for name in missing if name not in resolved]
+    if online and still_missing:
+        resolved.update((name, (match, "nominatim"))
+                        for name, match in _online_lookup(still_missing).items())
+
+    if conn is not None:
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO geocode_cache (name, latitude, longitude, source) VALUES (?, ?, ?, ?)",
+                    [(name, lat, lon, source) for name, ((lat, lon), source) in resolved.items()]
+                )
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+    coords.update((name, match) for name, (match, _) in resolved.items())
+    unresolved = [name for name in names if name not in coords]
+    return coords, unresolved
+
+
+def geocode_areas(areas):
+    """Geocode an area column, resolving each distinct name only once.
+
+    Returns (latitude, longitude, unresolved) where the coordinate Series
+    are NaN for unknown places, so they are dropped rather than mapped to 0,0.
+    """
+    codes, uniques = pd.factorize(areas)
+    coords, _ = resolve_names(uniques)
+
+    keys = [normalize_name(name) for name in uniques]
+    unresolved = sorted(str(name) for name, key in zip(uniques, keys) if key not in coords)
+    unique_lat = np.array([coords.get(key, (np.nan, np.nan))[0] for key in keys] + [np.nan])
+    unique_lon = np.array([coords.get(key, (np.nan, np.nan))[1] for key in keys] + [np.nan])
+
+    # Missing area values factorize to -1, which picks the trailing NaN
+    latitude = pd.Series(unique_lat[codes], index=areas.index, dtype=float)
+    longitude = pd.Series(unique_lon[codes], index=areas.index, dtype=float)
+    return latitude, longitude, unresolved
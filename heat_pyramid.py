@@ -0,0 +1,66 @@
+import numpy as np
+
+# Zoom levels at which heat aggregates are precomputed
+ZOOM_LEVELS = (3, 5, 7, 9, 11, 13)
+
+# Maximum number of heat points shipped to the browser per zoom level
+HEAT_POINT_BUDGET = 4000
+
+# Side of one aggregation cell, in screen pixels at the level's zoom
+CELL_PIXELS = 16
+
+
+def _web_mercator(lat, lon):
+    """Project degrees to normalized Web Mercator coordinates in [0, 1]"""
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = (lon + 180.0) / 360.0
+    lat_rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0
+    return x, y
+
+
+def aggregate_grid(lat, lon, weights, zoom, budget=HEAT_POINT_BUDGET):
+    """Bin points into square screen-space cells at a zoom level.
+
+    Returns an (n, 3) array of [lat, lon, weight] rows, one per occupied cell,
+    with the position at the weight-averaged centroid of the cell and weights
+    normalized to 0..1. Only the heaviest `budget` cells are kept.
+    """
+    if len(lat) == 0:
+        return np.empty((0, 3))
+
+    cells_per_side = (256 * 2 ** zoom) // CELL_PIXELS
+    x, y = _web_mercator(lat, lon)
+    ix = np.clip((x * cells_per_side).astype(np.int64), 0, cells_per_side - 1)
+    iy = np.clip((y * cells_per_side).astype(np.int64), 0, cells_per_side - 1)
+
+    _, inverse = np.unique(ix * cells_per_side + iy, return_inverse=True)
+    inverse = inverse.ravel()
+    n_cells = inverse.max() + 1
+
+    # Fall back to point counts where every weight in a cell is zero
+    weight_sum = np.bincount(inverse, weights=weights, minlength=n_cells)
+    centroid_weights = np.where(weight_sum[inverse] > 0, weights, 1.0)
+    norm = np.bincount(inverse, weights=centroid_weights, minlength=n_cells)
+    cell_lat = np.bincount(inverse, weights=lat * centroid_weights, minlength=n_cells) / norm
+    cell_lon = np.bincount(inverse, weights=lon * centroid_weights, minlength=n_cells) / norm
+
+    if n_cells > budget:
+        keep = np.argpartition(weight_sum, -budget)[-budget:]
+        cell_lat, cell_lon, weight_sum = cell_lat[keep], cell_lon[keep], weight_sum[keep]
+
+    peak = weight_sum.max()
+    intensity = weight_sum / peak if peak > 0 else np.ones_like(weight_sum)
+    return np.column_stack([cell_lat, cell_lon, intensity])
+
+
+def build_heat_pyramid(lat, lon, weights, zoom_levels=ZOOM_LEVELS, budget=HEAT_POINT_BUDGET):
+    """Precompute aggregated heat points for every zoom level.
+
+    Returns a dict mapping zoom level to an array of [lat, lon, weight] rows,
+    each capped at `budget` points regardless of the input size.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    return {zoom: aggregate_grid(lat, lon, weights, zoom, budget) for zoom in zoom_levels}
@@ -0,0 +1,202 @@
+import pandas as pd
+import numpy as np
+from perf import timed_import
+from dataset_registry import get_registry
+
+# Mean Earth radius, used to convert kilometres to angles
+EARTH_RADIUS_KM = 6371.0088
+
+# Grid cell offsets (one of each +/- pair) that can hold points within eps of
+# each other: cells have side eps/sqrt(3), so cells three apart on any axis
+# are more than eps apart
+NEIGHBOUR_OFFSETS = [(i, j, k) for i in range(-2, 3) for j in range(-2, 3) for k in range(-2, 3)
+                     if (i, j, k) > (0, 0, 0)]
+
+
+def unit_vectors(lat, lon):
+    """Points on the unit sphere; their chord distance grows with the great-circle distance"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def core_mask(xyz, weights, radius, min_cases):
+    """Whether the weights within radius of each point add up to at least min_cases.
+
+    Integer weights are split into binary digits and every digit is counted
+    with count-only tree queries, which count whole tree nodes inside the
+    radius at once instead of listing neighbours. Digits go from high to low
+    and points drop out once the outcome is certain.
+    """
+    KDTree = timed_import('sklearn.neighbors').KDTree
+    if weights.min() < 0 or not np.array_equal(weights, np.round(weights)):
+        # Fractional weights: exact tophat density, slower but still without neighbour lists
+        density = KDTree(xyz, sample_weight=weights).kernel_density(xyz, h=radius, kernel='tophat', rtol=0)
+        mass = density * (4 / 3 * np.pi * radius ** 3)
+        return mass >= min_cases * (1 - 1e-9)  # Rounding must not flip exact ties
+
+    w = weights.astype(np.int64)
+    counts = KDTree(xyz).query_radius(xyz, radius, count_only=True).astype(np.int64)
+    mass = np.zeros(len(xyz), dtype=np.int64)
+    open_points = np.arange(len(xyz))
+    for bit in reversed(range(int(w.max()).bit_length())):
+        # Each neighbour adds at most 2**(bit + 1) - 1 from the remaining digits
+        reachable = mass[open_points] + counts[open_points] * ((2 << bit) - 1) >= min_cases
+        open_points = open_points[(mass[open_points] < min_cases) & reachable]
+        if not len(open_points):
+            break
+        members = (w >> bit) & 1 == 1
+        if members.any():
+            found = KDTree(xyz[members]).query_radius(xyz[open_points], radius, count_only=True)
+            mass[open_points] += found.astype(np.int64) << bit
+    return mass >= min_cases
+
+
+def link_core_points(xyz, radius):
+    """Cluster index of each core point: connected components of the within-radius graph.
+
+    Core points are binned into grid cells small enough that each cell is one
+    component. Neighbouring cells are joined when the nearest point of one
+    lies within radius of some point of the other, found by one nearest-point
+    query per candidate point instead of listing all pairs.
+    """
+    KDTree = timed_import('sklearn.neighbors').KDTree
+    csgraph = timed_import('scipy.sparse.csgraph')
+    sparse = timed_import('scipy.sparse')
+
+    cells = np.floor(xyz / (radius / np.sqrt(3))).astype(np.int64)
+    cell_of = pd.DataFrame(cells).groupby([0, 1, 2], sort=False).ngroup().to_numpy()
+    n_cells = cell_of.max() + 1
+    coords = np.empty((n_cells, 3), dtype=np.int64)
+    coords[cell_of] = cells
+    lookup = pd.Series(np.arange(n_cells), index=pd.MultiIndex.from_arrays(coords.T))
+
+    # A fourth coordinate far larger than any chord keeps each query inside its target cell
+    spacing = 10.0
+    tree = KDTree(np.column_stack([xyz, cell_of * spacing]))
+    component = np.arange(n_cells)
+    sources, targets = [], []
+    for offset in NEIGHBOUR_OFFSETS:
+        target = lookup.reindex(pd.MultiIndex.from_arrays((coords + offset).T)).to_numpy()
+        cell = np.flatnonzero(~np.isnan(target))
+        target = target[~np.isnan(target)].astype(np.int64)
+        # Cells already joined through other offsets need no check
+        pending = component[cell] != component[target]
+        if not pending.any():
+            continue
+        partner = np.full(n_cells, -1)
+        partner[cell[pending]] = target[pending]
+        points = np.flatnonzero(partner[cell_of] >= 0)
+        queries = np.column_stack([xyz[points], partner[cell_of[points]] * spacing])
+        dist, _ = tree.query(queries, k=1)
+        hit = dist[:, 0] <= radius
+        if hit.any():
+            sources.append(cell_of[points[hit]])
+            targets.append(partner[cell_of[points[hit]]])
+            edges = np.concatenate(sources), np.concatenate(targets)
+            graph = sparse.coo_matrix((np.ones(len(edges[0])), edges), shape=(n_cells, n_cells))
+            component = csgraph.connected_components(graph, directed=False)[1]
+    return component[cell_of]
+
+
+def weighted_dbscan(lat, lon, weights, eps_km, min_cases):
+    """Case-weighted DBSCAN over great-circle distance, in memory linear in the points.
+
+    A point is a core point when the weights within `eps_km` of it (its own
+    included) add up to at least `min_cases`. Core points within `eps_km` of
+    each other share a cluster; other points within `eps_km` of a core point
+    join the cluster of the nearest one. Clusters are numbered in order of
+    their first core point, so core labels match sklearn's DBSCAN; a border
+    point in reach of two clusters may get the other one. Returns one label
+    per point, -1 for noise.
+    """
+    KDTree = timed_import('sklearn.neighbors').KDTree
+    xyz = unit_vectors(lat, lon)
+    radius = 2 * np.sin(eps_km / EARTH_RADIUS_KM / 2)
+    labels = np.full(len(xyz), -1, dtype=np.int64)
+
+    core = np.flatnonzero(core_mask(xyz, weights, radius, max(int(min_cases), 1)))
+    if not len(core):
+        return labels
+    components = link_core_points(xyz[core], radius)
+    rank = np.empty(components.max() + 1, dtype=np.int64)
+    first_seen = pd.unique(components)
+    rank[first_seen] = np.arange(len(first_seen))
+    labels[core] = rank[components]
+
+    border = np.flatnonzero(labels == -1)
+    if len(border):
+        dist, nearest = KDTree(xyz[core]).query(xyz[border], k=1)
+        reached = dist[:, 0] <= radius
+        labels[border[reached]] = labels[core[nearest[reached, 0]]]
+    return labels
+
+
+def cluster_labels(df, eps_km, min_cases):
+    """Cluster label of every row; rows that belong to no cluster get -1.
+
+    Rows sharing a coordinate (every row of a geocoded area does) are merged
+    into one point weighted by their total cases first: duplicates are always
+    in each other's neighbourhood, so the clusters are the same.
+    """
+    # Each pair hashed as one complex number: a single O(n) factorize
+    inverse, points = pd.factorize(df['Longitude'].to_numpy(dtype=float) + 1j * df['Latitude'].to_numpy(dtype=float))
+    weights = np.bincount(inverse, weights=df['cases'].to_numpy(dtype=float), minlength=len(points))
+    return weighted_dbscan(points.imag, points.real, weights, eps_km, min_cases)[inverse]
+
+
+def summarize_clusters(df, col_area, labels):
+    """Aggregate rows into one record per hotspot.
+
+    Points outside every cluster are kept as single-point hotspots so that an
+    isolated high-severity location still raises an alert.
+    """
+    labels = np.asarray(labels).copy()
+    isolated = labels == -1
+    next_id = labels.max() + 1 if len(labels) else 0
+    labels[isolated] = next_id + np.arange(isolated.sum())
+
+    cases = df['cases'].to_numpy(dtype=float)
+    rows = pd.DataFrame({
+        'cluster_id': labels,
+        'lat_w': df['Latitude'].to_numpy(dtype=float) * cases,
+        'lon_w': df['Longitude'].to_numpy(dtype=float) * cases,
+        'cases': cases,
+        'Severity': df['Severity'].to_numpy(),
+        'isolated': isolated,
+        'location': df[col_area].astype(str).to_numpy(),
+        'crime_type': (df['Group_Name'].astype(str).to_numpy()
+                       if 'Group_Name' in df.columns else 'N/A')
+    })
+
+    grouped = rows.groupby('cluster_id')
+    clusters = grouped.agg(
+        lat_w=('lat_w', 'sum'),
+        lon_w=('lon_w', 'sum'),
+        cases=('cases', 'sum'),
+        incidents=('cases', 'size'),
+        Severity=('Severity', 'max'),
+        isolated=('isolated', 'all')
+    )
+    clusters['Latitude'] = clusters.pop('lat_w') / clusters['cases']
+    clusters['Longitude'] = clusters.pop('lon_w') / clusters['cases']
+
+    # Dominant location and crime type by cases within each cluster
+    for col in ['location', 'crime_type']:
+        totals = rows.groupby(['cluster_id', col])['cases'].sum()
+        clusters[col] = totals.loc[totals.groupby(level=0).idxmax()].reset_index(level=1)[col]
+
+    return clusters.sort_values('cases', ascending=False)
+
+
+def find_hotspots(dataset_key, df, col_area, eps_km, min_cases):
+    """Cluster a dataset into hotspots, cached per dataset and parameters.
+
+    Returns (labels, clusters): the cluster label of every row and one summary
+    record per hotspot with its centroid, aggregate cases and peak severity.
+    Results are shared across sessions through the dataset registry.
+    """
+    def build():
+        labels = cluster_labels(df, eps_km, min_cases) if len(df) else np.empty(0, dtype=int)
+        return labels, summarize_clusters(df, col_area, labels)
+
+    return get_registry().get_or_create(('hotspots', dataset_key, eps_km, min_cases), build)
@@ -0,0 +1,313 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import threading
+import hashlib
+import secrets
+import json
+import os
+import dataset_store
+from dataset_registry import get_registry
+from aggregate_cube import AggregateCube, AREA, PERIOD, CRIME
+from data_loader import read_csv_bytes, read_csv_columns, unified_columns, column_mapping, clean_dataset, compact_frame, concat_compact, SOURCE_COL
+from metrics import TOP_K
+from perf import timed
+
+# Bump when the state layout changes so old state is rebuilt
+STATE_VERSION = 5
+
+# Leading bytes of a file remembered to notice when it was rewritten rather than appended to
+HEAD_BYTES = 4096
+
+
+class IncrementalDataset:
+    """A watched directory of CSV files, ingested incrementally.
+
+    Each refresh reads only the files that are new and the bytes appended to
+    files seen before (up to their last complete line). The new rows are
+    cleaned, written as one more Parquet part, and folded into running
+    aggregates: case totals, the high-severity count, the year, crime type and
+    location sets, the top-zone ranking and the area x year x crime cube
+    cells. The dashboard metrics and cube are served from those aggregates
+    without rescanning the rows. A file that shrinks or whose beginning
+    changes triggers a full rebuild.
+    """
+
+    def __init__(self, directory, col_area, col_cases, severity_col, date_col=None):
+        self.directory = directory
+        self.col_area = col_area
+        self.col_cases = col_cases
+        self.severity_col = severity_col
+        self.date_col = date_col
+        key = dataset_store.store_key('incremental', os.path.abspath(directory), col_area, col_cases,
+                                      severity_col, date_col)
+        self.state_dir = os.path.join(dataset_store.STORE_DIR, 'incremental', key)
+        self._lock = threading.Lock()
+        self._frame = None  # (parts count, frame) of the last assembled frame
+        self.state = self._load_state()
+
+    # --- persistence -----------------------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.state_dir, name)
+
+    def _empty_state(self):
+        # A fresh build id per (re)build keeps keys of a rebuilt state apart from the old one's
+        return {
+            'version': STATE_VERSION, 'build': secrets.token_hex(8), 'files': {}, 'parts': [], 'rows': 0,
+            'total_cases': 0, 'high_risk_zones': 0, 'years': [], 'crime_types': [], 'locations': [],
+            'ingested_at': None
+        }
+
+    def _load_state(self):
+        try:
+            with open(self._path('state.json')) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_state()
+        if state.get('version') != STATE_VERSION:
+            return self._empty_state()
+        return state
+
+    def _save_state(self):
+        tmp_path = self._path(f"state.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self._path('state.json'))
+
+    def _read_aggregate(self, name):
+        path = self._path(name)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def _write_aggregate(self, name, df):
+        tmp_path = self._path(f"{name}.{os.getpid()}.tmp")
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, self._path(name))
+
+    def _reset(self):
+        for name in os.listdir(self.state_dir):
+            os.remove(self._path(name))
+        self.state = self._empty_state()
+        self._frame = None
+
+    # --- ingestion -------------------------------------------------------------------------
+
+    def _pending(self):
+        """(name, path, offset, header) of every file with unread bytes; None if a rebuild is needed"""
+        pending = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.lower().endswith('.csv') or not os.path.isfile(path):
+                continue
+            seen = self.state['files'].get(name)
+            size = os.path.getsize(path)
+            if seen is None:
+                pending.append((name, path, 0, None))
+                continue
+            if size < seen['offset']:
+                return None
+            if size > seen['offset']:
+                with open(path, 'rb') as f:
+                    head = f.read(len(seen['head']) // 2)
+                if head.hex() != seen['head']:
+                    return None
+                pending.append((name, path, seen['offset'], bytes.fromhex(seen['header'])))
+        return pending
+
+    def _read_new_rows(self, name, path, offset, header):
+        """Clean the complete lines after offset; returns (frame, new file record)"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None, None
+        data = data[:end]
+        if header is None:
+            header = data[:data.find(b'\n') + 1]
+            body = data
+        else:
+            body = header + data
+
+        record = {'offset': offset + end, 'header': header.hex()}
+        with open(path, 'rb') as f:
+            record['head'] = f.read(min(HEAD_BYTES, offset + end)).hex()
+
+        raw, _ = read_csv_bytes(body)
+        if raw.empty:
+            return None, record
+        raw = raw.rename(columns=column_mapping(raw.columns.tolist()))
+        severity = self.severity_col if self.severity_col in raw.columns else None
+        df = compact_frame(clean_dataset(raw, self.col_area, self.col_cases, severity, self.date_col),
+                           self.col_area)
+        df[SOURCE_COL] = pd.Categorical.from_codes(np.zeros(len(df), dtype='int8'), categories=[name])
+        return df, record
+
+    def _fold(self, part):
+        """Add a new part's rows to the running aggregates"""
+        state = self.state
+        state['rows'] += len(part)
+        state['total_cases'] += int(part['cases'].sum())
+        state['high_risk_zones'] += int((part['Severity'] >= 4).sum())
+        for field, col in [('years', 'Year'), ('crime_types', 'Group_Name'), ('locations', self.col_area)]:
+            known = set(state[field])
+            state[field] += [value.item() if hasattr(value, 'item') else value
+                             for value in pd.unique(part[col].dropna()) if value not in known]
+
+        # nlargest keeps the earliest rows on ties, so ranking old winners
+        # ahead of the new part matches a ranking over all rows
+        top = self._read_aggregate('top_zones.parquet')
+        candidates = part.nlargest(TOP_K, ['Severity', 'cases'])
+        if top is not None:
+            candidates = pd.concat([top, candidates])
+        self._write_aggregate('top_zones.parquet', candidates.nlargest(TOP_K, ['Severity', 'cases']))
+
+        # Plain (non-categorical) labels, so cells from different parts align
+        cells = part.groupby([self.col_area, 'Year', 'Group_Name'], observed=True)['cases'].sum().reset_index()
+        cells.columns = [AREA, PERIOD, CRIME, 'cases']
+        for col in (AREA, CRIME):
+            cells[col] = cells[col].astype(object)
+        cells = cells.set_index([AREA, PERIOD, CRIME])['cases']
+        previous = self._read_aggregate('cells.parquet')
+        if previous is not None:
+            cells = previous['cases'].add(cells, fill_value=0)
+        self._write_aggregate('cells.parquet', cells.to_frame('cases'))
+
+    @timed("incremental_refresh")
+    def refresh(self):
+        """Ingest whatever arrived since the last refresh; returns the number of new rows"""
+        with self._lock:
+            os.makedirs(self.state_dir, exist_ok=True)
+            pending = self._pending()
+            if pending is None:
+                self._reset()
+                pending = self._pending()
+
+            if not pending:
+                return 0
+
+            frames = []
+            for name, path, offset, header in pending:
+                df, record = self._read_new_rows(name, path, offset, header)
+                if record is not None:
+                    self.state['files'][name] = record
+                if df is not None and len(df):
+                    frames.append(df)
+
+            added = 0
+            if frames:
+                part = concat_compact(frames, ignore_index=True)
+                part.index += self.state['rows']
+                part_name = f"part-{len(self.state['parts']):05d}.parquet"
+                part.to_parquet(self._path(part_name))
+                self._fold(part)
+                self.state['parts'].append(part_name)
+                # The newest rows were read now, so coverage ends at this moment
+                self.state['ingested_at'] = pd.Timestamp.now().isoformat()
+                added = len(part)
+            self._save_state()
+            return added
+
+    # --- results ---------------------------------------------------------------------------
+
+    def dataset_key(self):
+        """Changes whenever rows are appended or the state is rebuilt, so derived caches pick up new data"""
+        raw = json.dumps([self.state_dir, self.state['build'], self.state['parts'], self.state['rows']])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _assemble(self):
+        parts = self.state['parts']
+        if self._frame is not None and self._frame[0] == len(parts):
+            return self._frame[1]
+        done, frames = 0, []
+        if self._frame is not None and self._frame[0] < len(parts):
+            # Shallow copy: the previous frame may still be in use by other sessions
+            done, frames = self._frame[0], [self._frame[1].copy(deep=False)]
+        frames += [pd.read_parquet(self._path(name)) for name in parts[done:]]
+        if not frames:
+            return None
+        df = concat_compact(frames) if len(frames) > 1 else frames[0]
+        self._frame = (len(parts), df)
+        return df
+
+    def frame(self):
+        """All ingested rows; only parts added since the last call are read from disk"""
+        with self._lock:
+            return self._assemble()
+
+    def snapshot(self, registry):
+        """(frame, dataset_key, summary) of one state, with that key's metrics and cube seeded in registry.
+
+        Everything is read under the lock, so a refresh from another session
+        cannot land between computing the key and reading the aggregates.
+        """
+        with self._lock:
+            key = self.dataset_key()
+            registry.get_or_create(('metrics', key), self.metrics)
+            registry.get_or_create(('cube', key), self.cube)
+            return self._assemble(), key, self.summary()
+
+    def metrics(self):
+        """Dashboard metrics in compute_metrics' format, from the running aggregates"""
+        state = self.state
+        years = state['years']
+        year_min = min(years) if years else None
+        year_max = max(years) if years else None
+        top = self._read_aggregate('top_zones.parquet')
+        return {
+            'total_cases': state['total_cases'],
+            'high_risk_zones': state['high_risk_zones'],
+            'year_count': len(years),
+            'year_min': year_min,
+            'year_max': year_max,
+            'time_period': f"{year_min} - {year_max}" if len(years) > 1 else str(year_min),
+            'crime_types': len(state['crime_types']),
+            'locations': len(state['locations']),
+            'top_zones': top if top is not None else pd.DataFrame()
+        }
+
+    def cube(self):
+        """The yearly aggregate cube, from the running cube cells"""
+        cells = self._read_aggregate('cells.parquet')
+        return AggregateCube(cells['cases'], self.state['locations'], self.state['crime_types'],
+                             coverage_end=self.coverage_end())
+
+    def coverage_end(self):
+        """When the newest rows were ingested, or None before the first ingest"""
+        ingested_at = self.state['ingested_at']
+        return pd.Timestamp(ingested_at) if ingested_at else None
+
+    def summary(self):
+        return {'files': len(self.state['files']), 'rows': self.state['rows'], 'parts': len(self.state['parts']),
+                'ingested_at': self.state['ingested_at']}
+
+
+def directory_columns(directory):
+    """Combined column names of the CSV files in a directory, from their header rows only"""
+    headers = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith('.csv') and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                first_line = f.readline()
+            if first_line.strip():
+                headers.append(read_csv_columns(first_line)[0])
+    return unified_columns(headers) if headers else []
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_incremental(directory, col_area, col_cases, severity_col, date_col=None):
+    """The process-wide incremental dataset for a directory and column mapping"""
+    return IncrementalDataset(directory, col_area, col_cases, severity_col, date_col)
+
+
+def load_incremental(directory, col_area, col_cases, severity_col, date_col=None):
+    """Refresh a watched directory and return (frame, dataset_key, new rows, summary).
+
+    The dashboard metrics and cube for the returned key are seeded from the
+    running aggregates, so get_metrics and build_cube do not rescan the rows.
+    """
+    dataset = get_incremental(directory, col_area, col_cases, severity_col, date_col)
+    added = dataset.refresh()
+    df, key, summary = dataset.snapshot(get_registry())
+    return df, key, added, summary
@@ -1,18 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from auth import login, logout
-from report_generator import generate_pdf_report
-from sklearn.cluster import DBSCAN
-import folium
-from folium.plugins import HeatMap, MarkerCluster
-from streamlit_folium import st_folium
-import matplotlib.pyplot as plt
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from geopy.geocoders import Nominatim
-import time
-import pickle
+from auth import login, logout, is_admin
+from perf import timed_import, import_report, stage, timed, stage_report, report_json, report_prometheus, export_report
 import os
+import html
 from datetime import datetime
 import warnings
 
@@ -30,6 +22,47 @@ st.set_page_config(
    
 )
 login()
+
+# Analytics modules load only after login; their heavy third-party dependencies
+# (statsmodels, scikit-learn, scipy, matplotlib) are imported on first use
+from report_generator import generate_pdf_report, generate_reports_batch, reports_zip, zone_table, report_images
+from data_loader import (file_hash, read_csv_columns, clean_dataset, load_clean_dataset, find_col,
+                         COLUMN_CANDIDATES, DATE_COL, unified_columns, sources_hash, load_clean_sources,
+                         read_directory)
+from dataset_store import store_key
+from incremental import directory_columns, load_incremental
+from map_builder import get_hotspot_map
+from hotspots import find_hotspots
+from districts import BOUNDARIES_FILE, load_boundaries, join_districts
+from forecasting import forecast_series, batch_forecast
+from aggregate_cube import build_cube, AREA, CRIME
+from metrics import get_metrics, report_summary
+
+from dataset_registry import get_registry
+
+# Maximum number of hotspot alerts listed under Critical Alerts
+MAX_ALERTS = 25
+
+# Number of top locations whose trend chart is embedded in the PDF report
+REPORT_TREND_CHARTS = 3
+
+# Datasets shipped with the repository, selectable when nothing is uploaded
+BUNDLED_DATASETS = ["Test.csv", "Meteropolitian crime.csv", "State capital crime.csv", "Cross border crime.csv"]
+
+# Server directory whose CSV files can be loaded together (optional)
+DATA_DIR = os.environ.get("CRIMESCAN_DATA_DIR")
+
+# Show the performance panel to every user, not only CRIMESCAN_ADMINS.
+# CRIMESCAN_IMPORT_TIMINGS is the flag's former name and is still honoured.
+SHOW_DIAGNOSTICS = os.environ.get("CRIMESCAN_DIAGNOSTICS", os.environ.get("CRIMESCAN_IMPORT_TIMINGS")) == "1"
+
+# Sidebar choices for files without a date column or without a case count column
+NO_DATE_OPTION = "None (yearly data)"
+INCIDENT_ROWS_OPTION = "One incident per row"
+
+# Time granularities offered by the trend tabs when the data has timestamps
+GRANULARITY_LABELS = {'D': 'Day', 'W': 'Week', 'M': 'Month', 'Y': 'Year'}
+
 # Custom CSS with professional crime analytics theme
 st.markdown("""
     <style>
@@ -194,6 +227,13 @@ st.markdown("""
 
 
 
+def upload_hash(uploaded_file):
+    """Content hash of an uploaded file, computed once per upload instead of on every rerun"""
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = file_hash(uploaded_file.getvalue())
+    return hashes[uploaded_file.file_id]
+
 # =============================================
 # SIDEBAR - DATA CONFIGURATION
 # =============================================
@@ -205,114 +245,210 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader(" Upload Crime Data (CSV)", type=["csv"])
+    uploaded_files = st.file_uploader(" Upload Crime Data (CSV)", type=["csv"], accept_multiple_files=True)
     
-    if uploaded_file:
-        try:
-            # Try multiple encodings
-            encodings = ['utf-8', 'latin1', 'utf-16', 'iso-8859-1', 'cp1252']
-            
-            for encoding in encodings:
-                try:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding=encoding)
-                    st.success(f"✔️ File loaded successfully with {encoding} encoding!")
-                    break
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    st.error(f"Error with {encoding}: {str(e)}")
-                    continue
-            else:
-                st.error("❌ Failed to read file. Please convert to UTF-8.")
+    # Raw CSV bytes of the selected file; None for the built-in sample
+    csv_data = None
+    
+    # (name, bytes) of every file when several files are combined
+    csv_sources = None
+    
+    # Directory ingested incrementally, when watching one
+    watch_dir = None
+    
+    if len(uploaded_files) == 1:
+        csv_data = uploaded_files[0].getvalue()
+    elif uploaded_files:
+        csv_sources = [(file.name, file.getvalue()) for file in uploaded_files]
+    else:
+        st.info("ℹ️ Using sample dataset")
+        bundled = [name for name in BUNDLED_DATASETS if os.path.exists(name)]
+        combined = ["All bundled datasets"] if len(bundled) > 1 else []
+        if DATA_DIR and os.path.isdir(DATA_DIR):
+            combined += [f"All files in {DATA_DIR}", f"Watch {DATA_DIR} (incremental)"]
+        sample_choice = st.selectbox(" Sample dataset", options=["Built-in sample"] + bundled + combined)
+        if sample_choice == f"Watch {DATA_DIR} (incremental)":
+            watch_dir = DATA_DIR
+            st.button(" Check for new files", use_container_width=True)
+        elif sample_choice == "All bundled datasets":
+            csv_sources = []
+            for name in bundled:
+                with open(name, "rb") as f:
+                    csv_sources.append((name, f.read()))
+        elif sample_choice in combined:
+            csv_sources = read_directory(DATA_DIR)
+            if not csv_sources:
+                st.error(f"❌ No CSV files found in {DATA_DIR}")
                 st.stop()
-                
+        elif sample_choice == "Built-in sample":
+            df = pd.DataFrame({
+                'Area_Name': ["Delhi Central", "Mumbai Downtown", "Chennai Port", 
+                             "Kolkata Market", "Bangalore Tech Park", "Hyderabad Old City",
+                             "Pune Nightlife", "Jaipur Tourist Zone"],
+                'Year': [2023, 2023, 2023, 2023, 2023, 2023, 2023, 2023],
+                'Group_Name': ["Armed Robbery", "Gang Violence", "Drug Trafficking", 
+                             "Mass Theft", "Cyber Crime", "Communal Violence", "Drug Offenses", "Scams"],
+                'Cases_Property_Stolen': [45, 38, 28, 22, 15, 44, 33, 27],
+                'Latitude': [28.6139, 19.0760, 13.0827, 22.5726, 12.9716, 17.3616, 18.5204, 26.9124],
+                'Longitude': [77.2090, 72.8777, 80.2707, 88.3639, 77.5946, 78.4747, 73.8567, 75.7873],
+                'Severity': [5, 4, 4, 3, 2, 5, 3, 2]
+            })
+        else:
+            with open(sample_choice, "rb") as f:
+                csv_data = f.read()
+    
+    # Identifies the selected file(s); None for the built-in sample
+    content_hash = None
+    
+    if watch_dir is not None:
+        # New rows are ingested when the data is processed; only headers are read here
+        sample_cols = directory_columns(watch_dir)
+        if not sample_cols:
+            st.error(f"❌ No CSV files found in {watch_dir}")
+            st.stop()
+    elif csv_sources:
+        try:
+            # Headers only; files are mapped onto shared column names and parsed together later
+            content_hash = sources_hash(csv_sources, [upload_hash(file) for file in uploaded_files]
+                                        if uploaded_files else None)
+            sample_cols = unified_columns([read_csv_columns(data)[0] for _, data in csv_sources])
+            st.success(f"✔️ Combining {len(csv_sources)} files")
+        except Exception as e:
+            st.error(f"❌ Error reading files: {str(e)}")
+            st.stop()
+    elif csv_data is not None:
+        try:
+            # Only the header is read here; the body is parsed at most once per content hash
+            content_hash = upload_hash(uploaded_files[0]) if uploaded_files else file_hash(csv_data)
+            sample_cols, encoding = read_csv_columns(csv_data)
+            if uploaded_files:
+                st.success(f"✔️ File loaded successfully with {encoding} encoding!")
         except Exception as e:
             st.error(f"❌ Error reading file: {str(e)}")
             st.stop()
     else:
-        st.info("ℹ️ Using sample dataset")
-        df = pd.DataFrame({
-            'Area_Name': ["Delhi Central", "Mumbai Downtown", "Chennai Port", 
-                         "Kolkata Market", "Bangalore Tech Park", "Hyderabad Old City",
-                         "Pune Nightlife", "Jaipur Tourist Zone"],
-            'Year': [2023, 2023, 2023, 2023, 2023, 2023, 2023, 2023],
-            'Group_Name': ["Armed Robbery", "Gang Violence", "Drug Trafficking", 
-                         "Mass Theft", "Cyber Crime", "Communal Violence", "Drug Offenses", "Scams"],
-            'Cases_Property_Stolen': [45, 38, 28, 22, 15, 44, 33, 27],
-            'Latitude': [28.6139, 19.0760, 13.0827, 22.5726, 12.9716, 17.3616, 18.5204, 26.9124],
-            'Longitude': [77.2090, 72.8777, 80.2707, 88.3639, 77.5946, 78.4747, 73.8567, 75.7873],
-            'Severity': [5, 4, 4, 3, 2, 5, 3, 2]
-        })
+        sample_cols = df.columns.tolist()
 
     st.markdown("###  Data Configuration")
-    sample_cols = df.columns.tolist()
     
     # Auto-detect columns
-    def find_col(possible_names):
-        for name in possible_names:
-            if name in sample_cols:
-                return name
-        return sample_cols[0]
-    
     col_area = st.selectbox(" Location column", 
                           options=sample_cols,
-                          index=sample_cols.index(find_col(['Area_Name', 'Location', 'District'])))
+                          index=sample_cols.index(find_col(sample_cols, COLUMN_CANDIDATES['Area_Name'])))
+    
+    # Incident timestamps enable daily, weekly and monthly trends
+    date_names = [name for name in COLUMN_CANDIDATES['Date'] if name in sample_cols]
+    date_choice = st.selectbox(" Date column",
+                               options=[NO_DATE_OPTION] + sample_cols,
+                               index=1 + sample_cols.index(date_names[0]) if date_names else 0)
+    date_col = None if date_choice == NO_DATE_OPTION else date_choice
     
+    # Raw incident files usually have no count column: each row is one incident
+    has_counts = any(name in sample_cols for name in COLUMN_CANDIDATES['Cases_Property_Stolen'])
     col_cases = st.selectbox(" Cases count column", 
-                           options=sample_cols,
-                           index=sample_cols.index(find_col(['Cases_Property_Stolen', 'Cases', 'Count'])))
+                           options=sample_cols + [INCIDENT_ROWS_OPTION],
+                           index=len(sample_cols) if date_col and not has_counts else
+                           sample_cols.index(find_col(sample_cols, COLUMN_CANDIDATES['Cases_Property_Stolen'])))
+    if col_cases == INCIDENT_ROWS_OPTION:
+        col_cases = None
     
     # Check for severity column
-    if 'Severity' not in df.columns:
+    if 'Severity' not in sample_cols:
         st.warning(" No severity column found - will calculate from cases")
         severity_col = None
     else:
         severity_col = 'Severity'
+    
+    st.markdown("###  Hotspot Detection")
+    hotspot_eps_km = st.slider(" Cluster radius (km)", min_value=1, max_value=200, value=25)
+    hotspot_min_cases = st.number_input(" Minimum cases per hotspot", min_value=1, value=50, step=10)
+    
+    st.markdown("###  District Boundaries")
+    boundaries_file = st.file_uploader(" District or ward boundaries (GeoJSON)", type=["geojson", "json"])
+    
+    # GeoJSON bytes of the boundaries points are joined to; None when there are none
+    boundaries_data = None
+    if boundaries_file is not None:
+        boundaries_data = boundaries_file.getvalue()
+        boundaries_hash = upload_hash(boundaries_file)
+    elif BOUNDARIES_FILE and os.path.exists(BOUNDARIES_FILE):
+        with open(BOUNDARIES_FILE, "rb") as f:
+            boundaries_data = f.read()
+        boundaries_hash = file_hash(boundaries_data)
 
 # =============================================
 # DATA PROCESSING
 # =============================================
 try:
-    # Handle cases
-    df['cases'] = pd.to_numeric(df[col_cases], errors='coerce').fillna(0)
-    
-    # Calculate severity if not provided
-    if severity_col is None:
-        df['Severity'] = pd.cut(df['cases'],
-                              bins=[0, 10, 20, 30, 40, float('inf')],
-                              labels=[1, 2, 3, 4, 5]).astype(int)
-    
-    # Check for coordinates
-    if 'Latitude' not in df.columns or 'Longitude' not in df.columns:
-        st.warning(" No coordinates found. Using default coordinates for Indian cities.")
-        city_coords = {
-            'Delhi': (28.6139, 77.2090),
-            'Mumbai': (19.0760, 72.8777),
-            'Chennai': (13.0827, 80.2707),
-            'Kolkata': (22.5726, 88.3639),
-            'Bangalore': (12.9716, 77.5946),
-            'Hyderabad': (17.3616, 78.4747),
-            'Pune': (18.5204, 73.8567),
-            'Jaipur': (26.9124, 75.7873)
-        }
-        df['Latitude'] = df[col_area].map(lambda x: city_coords.get(x.split()[0], (0, 0))[0])
-        df['Longitude'] = df[col_area].map(lambda x: city_coords.get(x.split()[0], (0, 0))[1])
+    with stage("ingestion"):
+        # Check for coordinates
+        if 'Latitude' not in sample_cols or 'Longitude' not in sample_cols:
+            st.warning(" No coordinates found. Resolving locations with the offline gazetteer.")
+    
+        # Cleaned frames for files are kept in the on-disk Parquet store
+        if watch_dir is not None:
+            # Only files and rows that arrived since the last run are read
+            df, watch_key, new_rows, watch_summary = load_incremental(watch_dir, col_area, col_cases,
+                                                                        severity_col, date_col)
+            if df is None:
+                st.error("❌ No complete rows in the watched directory yet")
+                st.stop()
+            st.sidebar.caption(f"{watch_summary['files']} files · {watch_summary['rows']:,} rows ingested"
+                               + (f" · {new_rows:,} new" if new_rows else ""))
+        elif csv_sources:
+            df = load_clean_sources(content_hash, csv_sources, col_area, col_cases, severity_col, date_col)
+        elif csv_data is not None:
+            df = load_clean_dataset(content_hash, csv_data, col_area, col_cases, severity_col, date_col)
+        else:
+            df = clean_dataset(df, col_area, col_cases, severity_col, date_col)
+    
+        unresolved_areas = df.attrs.get('unresolved_areas', [])
+        if unresolved_areas:
+            preview = ", ".join(unresolved_areas[:10]) + (" ..." if len(unresolved_areas) > 10 else "")
+            st.warning(f" Could not geocode {len(unresolved_areas)} location(s); their rows were skipped: {preview}")
+    
+        # Identifies this dataset and column mapping for derived-result caches; only a
+        # watched directory says when its coverage ends (the latest ingest)
+        coverage_end = None
+        if watch_dir is not None:
+            dataset_key = watch_key
+            if watch_summary['ingested_at']:
+                coverage_end = pd.Timestamp(watch_summary['ingested_at'])
+        else:
+            dataset_key = store_key(content_hash or "builtin-sample",
+                                    col_area, col_cases, severity_col, date_col)
     
-    # Clean data
-    df = df.dropna(subset=['Latitude', 'Longitude'])
-    df = df[df['cases'] > 0]  # Remove rows with 0 cases
+    # Spatial hotspot clusters (case-weighted DBSCAN, great-circle distance), cached per dataset and parameters
+    with stage("hotspots"):
+        hotspot_labels, hotspot_clusters = find_hotspots(dataset_key, df, col_area,
+                                                         hotspot_eps_km, hotspot_min_cases)
     
 except Exception as e:
     st.error(f"❌ Error processing data: {str(e)}")
     st.stop()
 
+# Points joined to district polygons through an STRtree, cached per dataset and boundary file;
+# (boundaries, per-district summary) or None
+districts = None
+if boundaries_data is not None:
+    try:
+        with stage("districts"):
+            boundaries = load_boundaries(boundaries_hash, boundaries_data)
+            _, district_summary = join_districts(dataset_key, df, boundaries)
+            districts = (boundaries, district_summary)
+    except Exception as e:
+        st.warning(f" Could not use the district boundaries: {str(e)}")
+
 # =============================================
 # DASHBOARD - METRICS SECTION
 # =============================================
 st.markdown("""<div style="margin-top:20px; margin-bottom:20px;"><h2 class="title"> Executive Summary</h2>
 </div>""", unsafe_allow_html=True)
           
+# Summary figures and rankings shared with the PDF export, computed once per dataset
+with stage("metrics"):
+    metrics = get_metrics(dataset_key, df, col_area)
+
 cols = st.columns(4)
 with cols[0]:
     st.markdown("""
@@ -321,7 +457,7 @@ with cols[0]:
             <div class="metric-value">{:,}</div>
             <div style="font-size:12px;color:#7f8c8d;">Across all locations</div>
         </div>
-    """.format(int(df["cases"].sum())), unsafe_allow_html=True)
+    """.format(metrics['total_cases']), unsafe_allow_html=True)
     
 with cols[1]:
     st.markdown("""
@@ -330,7 +466,7 @@ with cols[1]:
             <div class="metric-value">{}</div>
             <div style="font-size:12px;color:#7f8c8d;">Severity ≥ 4</div>
         </div>
-    """.format(len(df[df['Severity'] >= 4])), unsafe_allow_html=True) 
+    """.format(metrics['high_risk_zones']), unsafe_allow_html=True) 
     
 with cols[2]:
     st.markdown("""
@@ -339,10 +475,7 @@ with cols[2]:
             <div class="metric-value">{}</div>
             <div style="font-size:12px;color:#7f8c8d;">{}</div>
         </div>
-    """.format(
-        df['Year'].nunique(),
-        f"{df['Year'].min()} - {df['Year'].max()}" if df['Year'].nunique() > 1 else str(df['Year'].min())
-    ), unsafe_allow_html=True)
+    """.format(metrics['year_count'], metrics['time_period']), unsafe_allow_html=True)
     
 with cols[3]:
     st.markdown("""
@@ -351,114 +484,81 @@ with cols[3]:
             <div class="metric-value">{}</div>
             <div style="font-size:12px;color:#7f8c8d;">Unique categories</div>
         </div>
-    """.format(df["Group_Name"].nunique()), unsafe_allow_html=True)
+    """.format(metrics['crime_types']), unsafe_allow_html=True)
     st.markdown("<div style='padding-top:30px;padding-bottom:30px;'></div>", unsafe_allow_html=True)
 
 # =============================================
 # HOTSPOT VISUALIZATION
 # =============================================
+# Each section below is a fragment: its own widgets rerun only that section,
+# and its outputs are cached on the dataset key and section inputs.
+hotspot_params = (hotspot_eps_km, hotspot_min_cases)
+
 st.markdown("""
     <div style='padding-top:40px; padding-bottom:40px;'>
         <h2> Crime Hotspot Analysis</h2>
     </div>
 """, unsafe_allow_html=True)
 
-def get_color(severity, cases):
-    """Return color based on severity and case count"""
-    if severity >= 4 or cases > 30:
-        return '#c62828'  # Emergency red
-    elif severity >= 3 or cases > 15:
-        return '#ef6c00'  # Dark amber
-    else:
-        return '#388e3c'  # Dark green
-# Create map with enhanced styling
-map_center = [df['Latitude'].mean(), df['Longitude'].mean()]
-m = folium.Map(
-    location=map_center, 
-    zoom_start=5,
-    tiles='cartodbpositron',
-    attr='CrimeScan'
-)
-
-# Add heatmap with custom gradient
-HeatMap(
-    data=df[['Latitude', 'Longitude', 'cases']].values,
-    radius=25,
-    blur=20,
-    gradient={0.1: 'blue', 0.3: 'lime', 0.5: 'yellow', 1: 'red'}
-).add_to(m)
-
-# Add markers with color-coding and custom icons
-marker_cluster = MarkerCluster(
-    name="Crime Clusters",
-    overlay=True,
-    control=True,
-    icon_create_function=None
-).add_to(m)
-
-for _, row in df.iterrows():
-    color = get_color(row['Severity'], row['cases'])
-    
-    # Custom icon based on crime type
-    icon_type = "exclamation-triangle" if row['Severity'] >= 4 else "exclamation-circle" if row['Severity'] >= 3 else "info-circle"
-    
-    folium.CircleMarker(
-        location=[row['Latitude'], row['Longitude']],
-        radius=8 + (row['cases'] / df['cases'].max() * 15),
-        color=color,
-        fill=True,
-        fill_color=color,
-        fill_opacity=0.7,
-        popup=folium.Popup(f"""
-            <div style="font-family: Arial; width: 250px;">
-                <h4 style="color:{color}; margin-bottom:5px;">{row[col_area]}</h4>
-                <div style="border-top:1px solid #eee; padding-top:5px;">
-                    <p style="margin:2px 0;"><b>Type:</b> {row.get('Group_Name', 'N/A')}</p>
-                    <p style="margin:2px 0;"><b>Cases:</b> {row['cases']}</p>
-                    <p style="margin:2px 0;"><b>Severity:</b> 
-                        <span style="color:{color}">{row['Severity']}/5</span>
-                    </p>
-                </div>
-            </div>
-        """, max_width=300),
-        tooltip=f"{row[col_area]} - {row['cases']} cases"
-    ).add_to(marker_cluster)
-
-# Add layer control
-folium.LayerControl().add_to(m)
+@st.fragment
+@timed("map_section")
+def hotspot_map_section(dataset_key, df, col_area, hotspot_clusters, hotspot_params, districts):
+    # Markers are computed column-wise and rendered client-side from a single layer
+    boundaries_key = districts[0].key if districts is not None else None
+    m = get_hotspot_map((dataset_key, boundaries_key) + hotspot_params, df, col_area, hotspot_clusters,
+                        hotspot_params[0], districts)
+    
+    # Display map in a styled container; panning and zooming never trigger a rerun
+    with st.container():
+        st.markdown("""
+            <div class="map-container">
+        """, unsafe_allow_html=True)
+        with stage("st_folium"):
+            timed_import('streamlit_folium').st_folium(m, width=1200, height=600, returned_objects=[])
+        st.markdown("</div>", unsafe_allow_html=True)
 
-# Display map in a styled container
-with st.container():
-    st.markdown("""
-        <div class="map-container">
-    """, unsafe_allow_html=True)
-    st_folium(m, width=1200, height=600)
-    st.markdown("</div>", unsafe_allow_html=True)
+hotspot_map_section(dataset_key, df, col_area, hotspot_clusters, hotspot_params, districts)
 
 # =============================================
 # ALERT SYSTEM
 # =============================================
-high_alert = df[df['Severity'] >= 4]
-if not high_alert.empty:
-    st.markdown("""
-    <h2 style='margin-top:30px; margin-bottom:30px;'>  Critical Alerts</h2>""",unsafe_allow_html=True)
-    
-    alert_cols = st.columns(1)
-    with alert_cols[0]:
-        for _, row in high_alert.iterrows():
-            st.markdown(f"""
-                <div class="stAlert alert-high">
-                    <div style="display:flex; align-items:center;">
-                        <span style="font-size:24px; margin-right:15px;">⚠️</span>
-                        <div>
-                            <h3 style="margin:0 0 5px 0; color:#c62828;">{row[col_area]}</h3>
-                            <p style="margin:2px 0;"><b>Crime Type:</b> {row.get('Group_Name', 'N/A')}</p>
-                            <p style="margin:2px 0;"><b>Cases Reported:</b> {row['cases']}</p>
-                            <p style="margin:2px 0;"><b>Severity Level:</b> {row['Severity']}/5 (High Risk)</p>
-                        </div>
+@st.cache_data(show_spinner=False, max_entries=32)
+def alert_cards(alert_key, _hotspot_clusters, eps_km):
+    """Markup for the Critical Alerts list, built once per dataset and hotspot parameters"""
+    high_alert = _hotspot_clusters[_hotspot_clusters['Severity'] >= 4].head(MAX_ALERTS)
+    cards = []
+    for _, row in high_alert.iterrows():
+        cluster_line = "" if row['isolated'] else f"""
+                        <p style="margin:2px 0;"><b>Hotspot Cluster:</b> {row['incidents']} incidents within {eps_km} km</p>"""
+        cards.append(f"""
+            <div class="stAlert alert-high">
+                <div style="display:flex; align-items:center;">
+                    <span style="font-size:24px; margin-right:15px;">⚠️</span>
+                    <div>
+                        <h3 style="margin:0 0 5px 0; color:#c62828;">{html.escape(str(row['location']))}</h3>
+                        <p style="margin:2px 0;"><b>Crime Type:</b> {html.escape(str(row['crime_type']))}</p>
+                        <p style="margin:2px 0;"><b>Cases Reported:</b> {row['cases']}</p>
+                        <p style="margin:2px 0;"><b>Severity Level:</b> {row['Severity']}/5 (High Risk)</p>{cluster_line}
                     </div>
                 </div>
-            """, unsafe_allow_html=True)
+            </div>
+        """)
+    return cards
+
+@st.fragment
+@timed("alerts_section")
+def alerts_section(dataset_key, hotspot_clusters, hotspot_params):
+    cards = alert_cards((dataset_key,) + hotspot_params, hotspot_clusters, hotspot_params[0])
+    if cards:
+        st.markdown("""
+        <h2 style='margin-top:30px; margin-bottom:30px;'>  Critical Alerts</h2>""",unsafe_allow_html=True)
+        
+        alert_cols = st.columns(1)
+        with alert_cols[0]:
+            for card in cards:
+                st.markdown(card, unsafe_allow_html=True)
+
+alerts_section(dataset_key, hotspot_clusters, hotspot_params)
 
 # =============================================
 # TIME SERIES ANALYSIS
@@ -466,49 +566,56 @@ if not high_alert.empty:
 st.markdown("""
     <h2 style='margin-top:40px; margin-bottom:40px;'> Crime Trend Forecast</h2>
 """, unsafe_allow_html=True)
-tab1, tab2 = st.tabs(["Location Trends", "Crime Type Analysis"])
 
-with tab1:
-    selected_location = st.selectbox("Select location for analysis", df[col_area].unique())
-    loc_data = df[df[col_area] == selected_location].groupby('Year')['cases'].sum()
+# Data with incident timestamps can be analyzed per day, week or month as well as per year
+if DATE_COL in df.columns:
+    granularity = st.radio("Time granularity", list(GRANULARITY_LABELS), index=len(GRANULARITY_LABELS) - 1,
+                           format_func=GRANULARITY_LABELS.get, horizontal=True)
+else:
+    granularity = 'Y'
+
+# Series per location and crime type, aggregated once per dataset and granularity;
+# the PDF export always uses the yearly cube
+with stage("cube"):
+    yearly_cube = build_cube(dataset_key, df, col_area, coverage_end=coverage_end)
+    cube = yearly_cube if granularity == 'Y' else build_cube(dataset_key, df, col_area, granularity, coverage_end)
+
+if cube.partial_period is not None:
+    partial = cube.partial_period
+    partial_label = partial.strftime('%Y-%m-%d') if isinstance(partial, pd.Timestamp) else str(partial)
+    st.caption(f"The last {GRANULARITY_LABELS[granularity].lower()} ({partial_label}) was still in progress "
+               f"at the latest ingest, so it is left out of the trends and forecasts.")
+
+tab1, tab2, tab3 = st.tabs(["Location Trends", "Crime Type Analysis", "Batch Forecast"])
+
+@st.fragment
+@timed("forecast_section")
+def location_trend_section(dataset_key, cube):
+    selected_location = st.selectbox("Select location for analysis", cube.locations)
+    loc_data = cube.location_series(selected_location)
     
     if len(loc_data) > 1:
         try:
-            model = SARIMAX(loc_data, order=(1,1,1), seasonal_order=(1,1,1,7))
-            results = model.fit(disp=False)
-            forecast = results.get_forecast(steps=1)
-            pred = forecast.predicted_mean
-            
-            fig, ax = plt.subplots(figsize=(10, 5))
-            loc_data.plot(ax=ax, label='Historical Data', linewidth=2.5, color='#3498db')
-            pred.plot(ax=ax, style='r--', label='1-Year Forecast', linewidth=2.5)
-            
-            # Highlight if predicted increase
-            if pred.iloc[0] > loc_data.mean():
-                ax.axvspan(loc_data.index[-1], pred.index[0], facecolor='#ffcccc', alpha=0.3)
-                ax.annotate('Projected Increase', 
-                           xy=(pred.index[0], pred.iloc[0]),
-                           xytext=(10,10), textcoords='offset points',
-                           bbox=dict(boxstyle='round,pad=0.5', fc='red', alpha=0.1),
-                           arrowprops=dict(arrowstyle='->'))
+            # Long series use SARIMAX (cached on disk, seasonal per granularity),
+            # short ones the vectorized trend model
+            forecast = forecast_series(loc_data, order=(1,1,1), granularity=cube.granularity)
+            pred = forecast['predicted_mean']
+            conf_int = forecast['conf_int']
             
-            ax.set_title(f"Crime Trend in {selected_location}", pad=20, fontsize=14)
-            ax.set_xlabel("Year", labelpad=10)
-            ax.set_ylabel("Reported Cases", labelpad=10)
-            ax.grid(True, alpha=0.3)
-            ax.legend()
-            
-            st.pyplot(fig)
+            charts = timed_import('charts')
+            st.image(charts.forecast_chart(dataset_key, selected_location, GRANULARITY_LABELS[cube.granularity],
+                                           loc_data, pred), width='stretch')
             
             # Display forecast metrics
-            change_pct = ((pred.iloc[0] - loc_data.iloc[-1]) / loc_data.iloc[-1]) * 100
-            alert_type = "danger" if change_pct > 0 else "success"
+            last_cases = loc_data.iloc[-1]
+            # % change from a period without cases is undefined
+            change = f"{(pred.iloc[0] - last_cases) / last_cases * 100:+.1f}%" if last_cases else "n/a"
             
             st.markdown(f"""
-                <div class="stAlert alert-{'high' if change_pct > 0 else 'medium'}">
+                <div class="stAlert alert-{'high' if pred.iloc[0] > last_cases else 'medium'}">
                     <h4 style="margin-top:0;">Forecast for Next Period</h4>
-                    <p><b>Expected Cases:</b> {int(pred.iloc[0])} ({change_pct:+.1f}% change)</p>
-                    <p><b>Confidence Interval:</b> {forecast.conf_int().iloc[0,0]:.1f} to {forecast.conf_int().iloc[0,1]:.1f} cases</p>
+                    <p><b>Expected Cases:</b> {int(pred.iloc[0])} ({change} change)</p>
+                    <p><b>Confidence Interval:</b> {f"{conf_int.iloc[0,0]:.1f} to {conf_int.iloc[0,1]:.1f} cases" if conf_int.iloc[0].notna().all() else "not available (too few data points)"}</p>
                 </div>
             """, unsafe_allow_html=True)
             
@@ -517,101 +624,235 @@ with tab1:
     else:
         st.warning("Not enough data points for time series analysis")
 
-with tab2:
-    selected_crime = st.selectbox("Select crime type for analysis", df['Group_Name'].unique())
-    crime_data = df[df['Group_Name'] == selected_crime].groupby('Year')['cases'].sum()
+@st.fragment
+@timed("crime_type_section")
+def crime_trend_section(dataset_key, cube):
+    selected_crime = st.selectbox("Select crime type for analysis", cube.crime_types)
+    crime_data = cube.crime_series(selected_crime)
     
     if len(crime_data) > 1:
-        fig, ax = plt.subplots(figsize=(10, 5))
-        crime_data.plot(
-            kind='bar', 
-            ax=ax, 
-            color=['#e74c3c' if val > crime_data.mean() else '#3498db' for val in crime_data]
-        )
-        ax.axhline(crime_data.mean(), color='#2c3e50', linestyle='--', label='Mean')
-        ax.set_title(f"Trend for {selected_crime}", pad=20, fontsize=14)
-        ax.set_xlabel("Year", labelpad=10)
-        ax.set_ylabel("Reported Cases", labelpad=10)
-        ax.legend(["Mean Cases", selected_crime])
-        st.pyplot(fig)
+        charts = timed_import('charts')
+        st.image(charts.crime_trend_chart(dataset_key, selected_crime, GRANULARITY_LABELS[cube.granularity],
+                                          crime_data), width='stretch')
     else:
         st.warning("Not enough data points for analysis")
 
+@st.fragment
+@timed("batch_forecast_section")
+def batch_forecast_section(dataset_key, cube):
+    batch_dimension = st.radio("Forecast every", ["Location", "Crime type"], horizontal=True)
+    batch_level = AREA if batch_dimension == "Location" else CRIME
+    batch_state_key = (dataset_key, batch_level, cube.granularity)
+    
+    if st.button("Run batch forecast", use_container_width=True):
+        progress_bar = st.progress(0.0, text="Fitting forecasts...")
+        
+        def report_progress(done, total):
+            progress_bar.progress(done / total, text=f"Fitted {done:,} of {total:,} series")
+        
+        try:
+            st.session_state.batch_forecast = (
+                batch_state_key,
+                batch_forecast(cube.matrix(batch_level), granularity=cube.granularity, progress=report_progress)
+            )
+        except Exception as e:
+            st.error(f"Error in batch forecasting: {str(e)}")
+        progress_bar.empty()
+    
+    stored = st.session_state.get("batch_forecast")
+    if stored is not None and stored[0] == batch_state_key:
+        batch_table = stored[1]
+        if batch_table.empty:
+            st.warning("Not enough data points for time series analysis")
+        else:
+            st.dataframe(
+                batch_table.rename(columns={
+                    batch_level: batch_dimension,
+                    'last_cases': 'Last Period',
+                    'predicted_cases': 'Predicted Cases',
+                    'change_pct': 'Change (%)',
+                    'ci_lower': 'CI Lower',
+                    'ci_upper': 'CI Upper',
+                    'model': 'Model'
+                })[[batch_dimension, 'Last Period', 'Predicted Cases', 'Change (%)', 'CI Lower', 'CI Upper', 'Model']],
+                use_container_width=True,
+                height=400
+            )
+            st.download_button(
+                label="📁 Download Forecast Table (CSV)",
+                data=batch_table.to_csv(index=False).encode(),
+                file_name=f"CrimeScan_Forecast_{batch_dimension.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+
+with tab1:
+    location_trend_section(dataset_key, cube)
+
+with tab2:
+    crime_trend_section(dataset_key, cube)
+
+with tab3:
+    batch_forecast_section(dataset_key, cube)
+
 # =============================================
 # TOP LOCATIONS TABLE
 # =============================================
 st.markdown("""
     <h2 style='margin-top:30px; margin-bottom:30px;'> Top Crime Zones</h2>
 """, unsafe_allow_html=True)
-top_locations = df.sort_values(['Severity', 'cases'], ascending=False).head(10)
+top_locations = metrics['top_zones']
 
-# Enhanced dataframe display
-st.dataframe(
-    top_locations[[col_area, 'Group_Name', 'cases', 'Severity']]
-    .rename(columns={
+@st.cache_data(show_spinner=False, max_entries=32)
+def top_zone_display(dataset_key, _top_locations, col_area):
+    """Top Crime Zones columns renamed for display, built once per dataset"""
+    return _top_locations[[col_area, 'Group_Name', 'cases', 'Severity']].rename(columns={
         col_area: 'Location',
         'Group_Name': 'Crime Type',
         'cases': 'Cases',
         'Severity': 'Severity Level'
     })
-    .style
-    .background_gradient(subset=['Cases'], cmap='Reds')
-    .applymap(lambda x: f"color: {'red' if x >=4 else 'orange' if x ==3 else 'green'}", subset=['Severity Level'])
-    .format({'Cases': '{:,}'}),
-    use_container_width=True,
-    height=400
-)
-st.subheader("🏆 Top Crime Zones")
-top_zones = df.sort_values(["Severity", "cases"], ascending=False).head(5)
-st.dataframe(top_zones)
+
+@st.fragment
+@timed("top_zones_section")
+def top_zones_section(dataset_key, top_locations, col_area):
+    # Enhanced dataframe display
+    st.dataframe(
+        top_zone_display(dataset_key, top_locations, col_area)
+        .style
+        .background_gradient(subset=['Cases'], cmap='Reds')
+        .applymap(lambda x: f"color: {'red' if x >=4 else 'orange' if x ==3 else 'green'}", subset=['Severity Level'])
+        .format({'Cases': '{:,}'}),
+        use_container_width=True,
+        height=400
+    )
+    st.subheader("🏆 Top Crime Zones")
+    top_zones = top_locations.head(5)
+    st.dataframe(top_zones)
+
+top_zones_section(dataset_key, top_locations, col_area)
+
+@st.fragment
+@timed("district_totals_section")
+def district_totals_section(district_summary):
+    # Totals per boundary polygon, independent of how area names are spelled
+    st.subheader("🗺️ Cases by District")
+    ranked = district_summary[district_summary['incidents'] > 0].sort_values('cases', ascending=False)
+    st.dataframe(
+        ranked.rename(columns={'cases': 'Cases', 'incidents': 'Incidents', 'high_risk': 'High Risk (Severity ≥ 4)'})
+        .style
+        .format({'Cases': '{:,.0f}'}),
+        hide_index=True,
+        use_container_width=True,
+        height=400
+    )
+    unmatched = district_summary.attrs.get('unmatched', 0)
+    if unmatched:
+        st.caption(f"{unmatched:,} rows fall outside every district boundary")
+
+if districts is not None:
+    district_totals_section(districts[1])
 
 
 # =============================================
 # PDF EXPORT SECTION
 # =============================================
 st.markdown("---")
-if st.button("📥 Export Report as PDF", use_container_width=True):
-    with st.spinner("Generating PDF report..."):
-        summary = {
-            "Total Cases": f"{int(df['cases'].sum()):,}",
-            "High Risk Zones": len(df[df["Severity"] >= 4]),
-            "Crime Types": df["Group_Name"].nunique(),
-            "Time Period": f"{df['Year'].min()} - {df['Year'].max()}" if df['Year'].nunique() > 1 else str(df['Year'].min()),
-            "Locations Analyzed": df[col_area].nunique()
-        }
 
-        # Prepare data for PDF
-        renamed_zones = top_locations.rename(columns={
-            col_area: 'Location',
-            'Group_Name': 'Crime Type',
-            'cases': 'Cases'
-        })
+@st.fragment
+@timed("export_section")
+def export_section(dataset_key, df, col_area, metrics, cube, hotspot_clusters, hotspot_params):
+    top_locations = metrics['top_zones']
+    if st.button("📥 Export Report as PDF", use_container_width=True):
+        with st.spinner("Generating PDF report..."):
+            summary = report_summary(metrics)
 
-        pdf_path = generate_pdf_report(summary, renamed_zones)
-        
-        if pdf_path and os.path.exists(pdf_path):
-            # Read the file and create download button
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_bytes = pdf_file.read()
+            # Prepare data for PDF
+            renamed_zones = zone_table(top_locations, col_area)
+
+            # Charts are drawn headlessly and cached per dataset, so repeat exports reuse them
+            report_trends = [(location, cube.location_series(location))
+                             for location in pd.unique(top_locations[col_area])[:REPORT_TREND_CHARTS]]
+            images = report_images(dataset_key, df, report_trends, hotspot_clusters, hotspot_params)
+
+            # Rendered in memory - no temporary file on disk
+            pdf_bytes = generate_pdf_report(summary, renamed_zones, images=images)
             
+            if pdf_bytes:
+                st.download_button(
+                    label="📁 Download PDF Report",
+                    data=pdf_bytes,
+                    file_name=f"CrimeScan_Report_{datetime.now().strftime('%Y%m%d')}.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
+                    
+                st.success("✅ Report generated successfully!")
+            else:
+                st.error("❌ Failed to generate PDF report")
+
+    batch_cols = st.columns([1, 2])
+    with batch_cols[0]:
+        report_dimension = st.selectbox("Batch reports by", ["Location", "Crime type"])
+    with batch_cols[1]:
+        st.markdown("<div style='padding-top:28px;'></div>", unsafe_allow_html=True)
+        run_batch_reports = st.button("📦 Export One Report per Group (ZIP)", use_container_width=True)
+
+    if run_batch_reports:
+        report_col = col_area if report_dimension == "Location" else 'Group_Name'
+        progress_bar = st.progress(0.0, text="Rendering reports...")
+        
+        def report_batch_progress(done, total):
+            progress_bar.progress(done / total, text=f"Rendered {done:,} of {total:,} reports")
+        
+        try:
+            reports = generate_reports_batch(df, report_col, col_area, dataset_key=dataset_key,
+                                             progress=report_batch_progress)
             st.download_button(
-                label="📁 Download PDF Report",
-                data=pdf_bytes,
-                file_name=f"CrimeScan_Report_{datetime.now().strftime('%Y%m%d')}.pdf",
-                mime="application/pdf",
+                label=f"📁 Download {len(reports):,} Reports (ZIP)",
+                data=reports_zip(reports),
+                file_name=f"CrimeScan_Reports_{report_dimension.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.zip",
+                mime="application/zip",
                 use_container_width=True
             )
-            
-            # Clean up temporary file
-            try:
-                os.remove(pdf_path)
-            except:
-                pass
-                
-            st.success("✅ Report generated successfully!")
+        except Exception as e:
+            st.error(f"❌ Failed to generate batch reports: {str(e)}")
+        progress_bar.empty()
+
+export_section(dataset_key, df, col_area, metrics, yearly_cube, hotspot_clusters, hotspot_params)
+
+
+# Stages and lazy imports are recorded while the page renders, so the report is built last
+if SHOW_DIAGNOSTICS or is_admin(st.session_state.get("username")):
+    with st.sidebar.expander("🛠️ Performance"):
+        stages = stage_report()
+        if stages:
+            st.dataframe(pd.DataFrame(stages)[['stage', 'calls', 'last_seconds', 'mean_seconds', 'max_seconds',
+                                               'peak_rss_growth_bytes', 'peak_alloc_bytes']],
+                         hide_index=True)
+        
+        timings = import_report()
+        st.markdown("**Lazy imports**")
+        if timings:
+            st.dataframe(pd.DataFrame(timings, columns=["Module", "Seconds"]), hide_index=True)
         else:
-            st.error("❌ Failed to generate PDF report")
+            st.caption("No lazy imports in this process yet")
+        
+        usage = get_registry().usage()
+        st.markdown("**Shared dataset cache**")
+        st.caption(f"{usage['bytes'] / 2**20:,.1f} of {usage['max_bytes'] / 2**20:,.0f} MB in "
+                   f"{usage['entries']} entries · {usage['hits']:,} hits, {usage['misses']:,} misses, "
+                   f"{usage['evictions']:,} evictions")
+        if usage['items']:
+            st.dataframe(pd.DataFrame(usage['items'], columns=["Kind", "Bytes"]), hide_index=True)
+        
+        st.download_button("Download report (JSON)", report_json(), file_name="crimescan_stages.json",
+                           mime="application/json", use_container_width=True)
+        st.download_button("Download report (Prometheus)", report_prometheus(), file_name="crimescan_stages.prom",
+                           mime="text/plain", use_container_width=True)
 
+# Scrapeable copy of the report (CRIMESCAN_METRICS_FILE), rate-limited
+export_report()
 
 # =============================================
 # FOOTER
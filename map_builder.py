@@ -0,0 +1,236 @@
+import html
+import streamlit as st
+import folium
+from folium.plugins import HeatMap, FastMarkerCluster
+from branca.element import MacroElement
+from jinja2 import Template
+import numpy as np
+import pandas as pd
+from heat_pyramid import build_heat_pyramid
+from districts import DISTRICT_COL
+from perf import timed
+
+# Marker colors by risk level
+HIGH_RISK_COLOR = '#c62828'  # Emergency red
+MEDIUM_RISK_COLOR = '#ef6c00'  # Dark amber
+LOW_RISK_COLOR = '#388e3c'  # Dark green
+
+# Maximum number of hotspot cluster outlines drawn on the map
+MAX_CLUSTER_SHAPES = 200
+
+# Builds each marker and its popup in the browser from a compact data row:
+# [lat, lon, color, radius, location, crime type, cases, severity, icon]
+# Labels come from the uploaded CSV and are HTML-escaped by marker_frame
+MARKER_CALLBACK = """
+function (row) {
+    var color = row[2];
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: row[3],
+        color: color,
+        fill: true,
+        fillColor: color,
+        fillOpacity: 0.7
+    });
+    var popup = '<div style="font-family: Arial; width: 250px;">'
+        + '<h4 style="color:' + color + '; margin-bottom:5px;">'
+        + '<i class="fa fa-' + row[8] + '"></i> ' + row[4] + '</h4>'
+        + '<div style="border-top:1px solid #eee; padding-top:5px;">'
+        + '<p style="margin:2px 0;"><b>Type:</b> ' + row[5] + '</p>'
+        + '<p style="margin:2px 0;"><b>Cases:</b> ' + row[6] + '</p>'
+        + '<p style="margin:2px 0;"><b>Severity:</b> '
+        + '<span style="color:' + color + '">' + row[7] + '/5</span></p>'
+        + '</div></div>';
+    marker.bindPopup(popup, {maxWidth: 300});
+    marker.bindTooltip(row[4] + ' - ' + row[6] + ' cases');
+    return marker;
+}
+"""
+
+
+class ZoomLayerSwitch(MacroElement):
+    """Show exactly one of several layers, picked by the map's current zoom.
+
+    `levels` is a list of (min_zoom, layer) pairs; the layer with the highest
+    min_zoom not above the current zoom is shown.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var levels = [
+                {%- for zoom, layer in this.levels %}
+                [{{ zoom }}, {{ layer.get_name() }}],
+                {%- endfor %}
+            ];
+            function update() {
+                var zoom = map.getZoom();
+                var active = levels[0][1];
+                levels.forEach(function (level) {
+                    if (level[0] <= zoom) { active = level[1]; }
+                });
+                levels.forEach(function (level) {
+                    if (level[1] === active) {
+                        if (!map.hasLayer(level[1])) { map.addLayer(level[1]); }
+                    } else if (map.hasLayer(level[1])) {
+                        map.removeLayer(level[1]);
+                    }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels):
+        super().__init__()
+        self._name = "ZoomLayerSwitch"
+        self.levels = sorted(levels, key=lambda level: level[0])
+
+
+def add_heat_pyramid(m, df):
+    """Add one pre-aggregated heat layer per zoom level, switched client-side"""
+    pyramid = build_heat_pyramid(df['Latitude'], df['Longitude'], df['cases'])
+    levels = []
+    for zoom, points in pyramid.items():
+        layer = HeatMap(
+            data=points,
+            radius=25,
+            blur=20,
+            gradient={0.1: 'blue', 0.3: 'lime', 0.5: 'yellow', 1: 'red'},
+            control=False
+        ).add_to(m)
+        levels.append((zoom, layer))
+    ZoomLayerSwitch(levels).add_to(m)
+
+
+def escaped_labels(values):
+    """HTML-escaped string labels, escaping each distinct label once"""
+    codes, uniques = pd.factorize(pd.Series(values).astype(str))
+    return np.array([html.escape(label) for label in uniques], dtype=object)[codes]
+
+
+def marker_frame(df, col_area):
+    """Compute marker color, radius and icon for every row in one vectorized pass"""
+    severity = df['Severity'].to_numpy()
+    cases = df['cases'].to_numpy(dtype=float)
+
+    color = np.select(
+        [(severity >= 4) | (cases > 30), (severity >= 3) | (cases > 15)],
+        [HIGH_RISK_COLOR, MEDIUM_RISK_COLOR],
+        default=LOW_RISK_COLOR
+    )
+    icon = np.select(
+        [severity >= 4, severity >= 3],
+        ['exclamation-triangle', 'exclamation-circle'],
+        default='info-circle'
+    )
+    max_cases = cases.max() if len(cases) else 0
+    radius = 8 + (cases / max_cases * 15) if max_cases > 0 else np.full(len(cases), 8.0)
+
+    return pd.DataFrame({
+        'Latitude': df['Latitude'].astype(float).to_numpy(),
+        'Longitude': df['Longitude'].astype(float).to_numpy(),
+        'color': color,
+        'radius': radius.round(2),
+        'location': escaped_labels(df[col_area]),
+        'crime_type': escaped_labels(df['Group_Name']) if 'Group_Name' in df.columns else 'N/A',
+        'cases': cases,
+        'severity': severity,
+        'icon': icon
+    }, index=df.index)
+
+
+def marker_rows(markers):
+    """Convert a marker frame to plain Python rows for the client-side callback"""
+    columns = ['Latitude', 'Longitude', 'color', 'radius', 'location',
+               'crime_type', 'cases', 'severity', 'icon']
+    return [list(row) for row in zip(*(markers[col].tolist() for col in columns))]
+
+
+def add_cluster_layer(m, clusters, radius_km):
+    """Outline the largest multi-point hotspot clusters around their centroids"""
+    group = folium.FeatureGroup(name="Hotspot Clusters", show=True)
+    shown = clusters[~clusters['isolated']].head(MAX_CLUSTER_SHAPES)
+    for cluster_id, row in shown.iterrows():
+        color = HIGH_RISK_COLOR if row['Severity'] >= 4 else MEDIUM_RISK_COLOR
+        folium.Circle(
+            location=[row['Latitude'], row['Longitude']],
+            radius=radius_km * 1000,
+            color=color,
+            weight=2,
+            fill=True,
+            fill_opacity=0.08,
+            tooltip=(f"Hotspot {cluster_id}: {html.escape(str(row['location']))} - "
+                     f"{int(row['cases']):,} cases in {row['incidents']} incidents")
+        ).add_to(group)
+    group.add_to(m)
+
+
+def add_district_layer(m, boundaries, summary):
+    """Shade district polygons by their total cases, with a tooltip per district"""
+    geojson = boundaries.geojson({
+        'district_id': list(range(len(summary))),
+        'cases': summary['cases'].astype(int).tolist(),
+        'incidents': summary['incidents'].tolist()
+    })
+    choropleth = folium.Choropleth(
+        geo_data=geojson,
+        data=pd.DataFrame({'district_id': range(len(summary)), 'cases': summary['cases'].to_numpy()}),
+        columns=['district_id', 'cases'],
+        key_on='feature.properties.district_id',
+        fill_color='YlOrRd',
+        fill_opacity=0.5,
+        line_opacity=0.4,
+        nan_fill_opacity=0,
+        name="District Totals",
+        legend_name="Cases per district",
+        highlight=True,
+        show=True
+    ).add_to(m)
+    folium.GeoJsonTooltip(fields=[DISTRICT_COL, 'cases', 'incidents'],
+                          aliases=['District', 'Cases', 'Incidents']).add_to(choropleth.geojson)
+
+
+@timed("map_build")
+def build_hotspot_map(df, col_area, clusters=None, cluster_radius_km=25, districts=None):
+    """Build the hotspot map: zoom-aware heat pyramid, hotspot clusters and one marker layer.
+
+    `districts` is an optional (boundaries, summary) pair from the district
+    join, drawn as a choropleth of cases per polygon.
+    """
+    map_center = [float(df['Latitude'].mean()), float(df['Longitude'].mean())]
+    m = folium.Map(
+        location=map_center,
+        zoom_start=5,
+        tiles='cartodbpositron',
+        attr='CrimeScan'
+    )
+
+    if districts is not None:
+        add_district_layer(m, *districts)
+
+    # Heat is aggregated server-side so the payload stays bounded at every zoom
+    add_heat_pyramid(m, df)
+
+    if clusters is not None:
+        add_cluster_layer(m, clusters, cluster_radius_km)
+
+    # All markers go out as one data array and are built in the browser
+    FastMarkerCluster(
+        data=marker_rows(marker_frame(df, col_area)),
+        callback=MARKER_CALLBACK,
+        name="Crime Clusters",
+        overlay=True,
+        control=True
+    ).add_to(m)
+
+    # Add layer control
+    folium.LayerControl().add_to(m)
+    return m
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_hotspot_map(map_key, _df, col_area, _clusters=None, cluster_radius_km=25, _districts=None):
+    """Hotspot map built once per `map_key` (dataset, hotspot parameters and boundary file)"""
+    return build_hotspot_map(_df, col_area, _clusters, cluster_radius_km, _districts)
@@ -0,0 +1,45 @@
+import pandas as pd
+import numpy as np
+from dataset_registry import get_registry
+
+# Number of rows kept in the Top Crime Zones ranking
+TOP_K = 10
+
+
+def compute_metrics(df, col_area, top_k=TOP_K):
+    """Compute every dashboard summary figure and the top-k ranking.
+
+    Each figure is a single vectorized reduction over one column, and the
+    ranking uses nlargest on (Severity, cases) rather than a full sort.
+    """
+    years = pd.unique(df['Year'])
+    year_min = years.min() if len(years) else None
+    year_max = years.max() if len(years) else None
+
+    return {
+        'total_cases': int(df['cases'].to_numpy().sum()),
+        'high_risk_zones': int(np.count_nonzero(df['Severity'].to_numpy() >= 4)),
+        'year_count': len(years),
+        'year_min': year_min,
+        'year_max': year_max,
+        'time_period': f"{year_min} - {year_max}" if len(years) > 1 else str(year_min),
+        'crime_types': df['Group_Name'].nunique(),
+        'locations': df[col_area].nunique(),
+        'top_zones': df.nlargest(top_k, ['Severity', 'cases'])
+    }
+
+
+def report_summary(metrics):
+    """Summary lines for the PDF report, taken from the shared metrics"""
+    return {
+        "Total Cases": f"{metrics['total_cases']:,}",
+        "High Risk Zones": metrics['high_risk_zones'],
+        "Crime Types": metrics['crime_types'],
+        "Time Period": metrics['time_period'],
+        "Locations Analyzed": metrics['locations']
+    }
+
+
+def get_metrics(dataset_key, df, col_area):
+    """Dashboard metrics, computed once per dataset and shared across sessions"""
+    return get_registry().get_or_create(('metrics', dataset_key), lambda: compute_metrics(df, col_area))
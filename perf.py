@@ -0,0 +1,251 @@
+import importlib
+import subprocess
+import threading
+import tracemalloc
+import functools
+import logging
+import json
+import sys
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows - no peak RSS figure
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent on each module imported through timed_import in this process
+IMPORT_TIMINGS = {}
+
+# Modules whose cold import time is reported by `python perf.py`
+STARTUP_MODULES = (
+    "streamlit",
+    "pandas",
+    "auth",
+    "data_loader",
+    "dataset_store",
+    "metrics",
+    "aggregate_cube",
+    "hotspots",
+    "districts",
+    "forecasting",
+    "map_builder",
+    "report_generator",
+    "charts",
+    "streamlit_folium",
+    "matplotlib.pyplot",
+    "sklearn.neighbors",
+    "scipy.sparse.csgraph",
+    "shapely",
+    "scipy.stats",
+    "statsmodels.tsa.statespace.sarimax",
+)
+
+
+def timed_import(name):
+    """Import a module on first use, recording how long the import took.
+
+    Heavy analytics dependencies are loaded through this at the point they are
+    needed, so the login page does not pay for them.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMINGS[name] = time.perf_counter() - start
+    return module
+
+
+def import_report():
+    """(module, seconds) pairs for the lazy imports done so far, slowest first"""
+    return sorted(IMPORT_TIMINGS.items(), key=lambda item: item[1], reverse=True)
+
+
+# Trace Python allocations so stages report their peak allocation; this slows
+# allocation-heavy code noticeably, so it is off unless asked for
+TRACE_MEMORY = os.environ.get("CRIMESCAN_TRACE_MEMORY") == "1"
+
+# File the stage report is exported to (.json, otherwise Prometheus text format)
+METRICS_FILE = os.environ.get("CRIMESCAN_METRICS_FILE")
+
+# Minimum seconds between two exports to METRICS_FILE
+METRICS_EXPORT_INTERVAL = float(os.environ.get("CRIMESCAN_METRICS_INTERVAL", "15"))
+
+_stats_lock = threading.Lock()
+_stage_stats = {}
+_local = threading.local()
+_last_export = 0.0
+
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+def _max_rss_bytes():
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@contextmanager
+def stage(name):
+    """Record wall time, call count and memory for one run of a named stage.
+
+    Every stage records how much it raised the process's peak RSS. With
+    CRIMESCAN_TRACE_MEMORY=1 it also records its peak traced allocation;
+    nested stages each get their own peak.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+    # [allocation at entry, highest peak seen so far]
+    frame = [current if tracing else 0, 0]
+    stack.append(frame)
+    rss_before = _max_rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        rss_growth = _max_rss_bytes() - rss_before
+        stack.pop()
+        alloc = None
+        if tracing and tracemalloc.is_tracing():
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            alloc = max(peak - frame[0], 0)
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+        _record(name, seconds, rss_growth, alloc)
+
+
+def _record(name, seconds, rss_growth, alloc):
+    with _stats_lock:
+        stats = _stage_stats.setdefault(name, {
+            'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0,
+            'peak_rss_growth_bytes': 0, 'peak_alloc_bytes': None
+        })
+        stats['calls'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['last_seconds'] = seconds
+        stats['peak_rss_growth_bytes'] = max(stats['peak_rss_growth_bytes'], rss_growth)
+        if alloc is not None:
+            stats['peak_alloc_bytes'] = max(stats['peak_alloc_bytes'] or 0, alloc)
+
+
+def timed(name):
+    """Decorator recording every call of a function as a stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_report():
+    """Per-stage figures recorded in this process, slowest total first"""
+    with _stats_lock:
+        rows = [dict(stats, stage=name, mean_seconds=stats['total_seconds'] / stats['calls'])
+                for name, stats in _stage_stats.items()]
+    return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+
+def report_json():
+    """The stage and import reports as a JSON document"""
+    return json.dumps({
+        'generated_at': time.time(),
+        'stages': stage_report(),
+        'imports': dict(import_report())
+    }, indent=2)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def report_prometheus():
+    """The stage and import reports in the Prometheus text exposition format"""
+    metrics = [
+        ('crimescan_stage_calls_total', 'counter', 'Number of runs of a stage', 'calls'),
+        ('crimescan_stage_seconds_total', 'counter', 'Wall time spent in a stage', 'total_seconds'),
+        ('crimescan_stage_seconds_max', 'gauge', 'Slowest single run of a stage', 'max_seconds'),
+        ('crimescan_stage_seconds_last', 'gauge', 'Wall time of the latest run of a stage', 'last_seconds'),
+        ('crimescan_stage_peak_rss_growth_bytes', 'gauge',
+         'Largest rise of the process peak RSS during a stage', 'peak_rss_growth_bytes'),
+        ('crimescan_stage_peak_alloc_bytes', 'gauge',
+         'Largest traced Python allocation peak of a stage', 'peak_alloc_bytes'),
+    ]
+    rows = stage_report()
+    lines = []
+    for metric, kind, help_text, field in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{stage="{_label(row["stage"])}"}} {row[field]}'
+                  for row in rows if row[field] is not None]
+    lines += ["# HELP crimescan_import_seconds Time taken by a lazy import",
+              "# TYPE crimescan_import_seconds gauge"]
+    lines += [f'crimescan_import_seconds{{module="{_label(name)}"}} {seconds}'
+              for name, seconds in import_report()]
+    return "\n".join(lines) + "\n"
+
+
+def export_report(path=METRICS_FILE, force=False):
+    """Write the report to path (JSON for .json files, otherwise Prometheus text).
+
+    Exports are rate-limited to one per METRICS_EXPORT_INTERVAL seconds unless
+    `force` is set. The file is replaced atomically so scrapers never see a
+    partial write. Returns whether the file was written; write errors are
+    logged, not raised.
+    """
+    global _last_export
+    if not path:
+        return False
+    now = time.monotonic()
+    with _stats_lock:
+        if not force and now - _last_export < METRICS_EXPORT_INTERVAL:
+            return False
+        _last_export = now
+    content = report_json() if path.endswith(".json") else report_prometheus()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # Metrics must never fail the page; the rate limit also spaces out these warnings
+        logger.warning("Could not export the stage report to %s: %s", path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def cold_import_time(name):
+    """Seconds needed to import a module in a fresh interpreter"""
+    code = ("import time; start = time.perf_counter(); "
+            f"import {name}; print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    # Cold-start import report: python perf.py [module ...]
+    modules = sys.argv[1:] or STARTUP_MODULES
+    timings = [(name, cold_import_time(name)) for name in modules]
+    width = max(len(name) for name in modules)
+    for name, seconds in sorted(timings, key=lambda item: -(item[1] or 0)):
+        shown = "failed" if seconds is None else f"{seconds * 1000:8.1f} ms"
+        print(f"{name:<{width}}  {shown}")
@@ -1,82 +1,203 @@
 from fpdf import FPDF
 import streamlit as st
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from metrics import compute_metrics, report_summary
+from perf import timed_import, timed
+import multiprocessing
+import zipfile
+import io
 import os
+import re
 
-def generate_pdf_report(summary_data, top_zones):
-    try:
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
+def zone_table(top_zones, col_area):
+    """Rename ranking columns to the headings used in the report table"""
+    return top_zones.rename(columns={
+        col_area: 'Location',
+        'Group_Name': 'Crime Type',
+        'cases': 'Cases'
+    })
 
-        # Header
-        pdf.set_font("Arial", "B", 20)
-        pdf.set_text_color(13, 71, 161)  # Blue color
-        pdf.cell(0, 15, "CrimeScan Analysis Report", ln=True, align="C")
-        
-        # Date
-        pdf.set_font("Arial", size=10)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align="R")
-        pdf.ln(10)
+def render_pdf_report(summary_data, top_zones, scope=None, images=None):
+    """Render the report in memory and return the PDF bytes.
 
-        # Summary Section
-        pdf.set_font("Arial", "B", 14)
-        pdf.cell(0, 10, "Executive Summary", ln=True)
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(5)
+    `images` is an optional list of (caption, PNG path) pairs embedded in a
+    Charts section after the Top Crime Zones table.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
 
-        pdf.set_font("Arial", size=12)
-        for key, value in summary_data.items():
-            # Replace bullet character with simple dash
-            pdf.cell(0, 8, f"- {key}: {value}", ln=True)
+    # Header
+    pdf.set_font("Arial", "B", 20)
+    pdf.set_text_color(13, 71, 161)  # Blue color
+    pdf.cell(0, 15, "CrimeScan Analysis Report", ln=True, align="C")
+    if scope:
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 8, str(scope).encode('latin-1', 'ignore').decode('latin-1'), ln=True, align="C")
+    
+    # Date
+    pdf.set_font("Arial", size=10)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align="R")
+    pdf.ln(10)
 
-        pdf.ln(10)
+    # Summary Section
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Executive Summary", ln=True)
+    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+    pdf.ln(5)
+
+    pdf.set_font("Arial", size=12)
+    for key, value in summary_data.items():
+        # Replace bullet character with simple dash
+        pdf.cell(0, 8, f"- {key}: {value}", ln=True)
+
+    pdf.ln(10)
+
+    # Top Crime Zones Section
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Top Crime Zones", ln=True)
+    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+    pdf.ln(5)
+
+    # Check if top_zones has data
+    if not top_zones.empty:
+        pdf.set_font("Arial", "B", 10)
+        # Table headers
+        pdf.cell(60, 8, "Location", 1, 0, "C")
+        pdf.cell(60, 8, "Crime Type", 1, 0, "C")
+        pdf.cell(30, 8, "Cases", 1, 0, "C")
+        pdf.cell(30, 8, "Severity", 1, 1, "C")
+
+        pdf.set_font("Arial", size=10)
+        for _, row in top_zones.head(10).iterrows():  # Limit to top 10
+            # Clean text to avoid encoding issues
+            location = str(row.get('Location', 'N/A')).encode('latin-1', 'ignore').decode('latin-1')[:25]
+            crime_type = str(row.get('Crime Type', 'N/A')).encode('latin-1', 'ignore').decode('latin-1')[:25]
+            cases = str(row.get('Cases', 0))
+            severity = str(row.get('Severity', 0))
+            
+            pdf.cell(60, 8, location, 1, 0)
+            pdf.cell(60, 8, crime_type, 1, 0)
+            pdf.cell(30, 8, cases, 1, 0, "C")
+            pdf.cell(30, 8, severity, 1, 1, "C")
+    else:
+        pdf.set_font("Arial", size=12)
+        pdf.cell(0, 8, "No crime zone data available", ln=True)
 
-        # Top Crime Zones Section
+    # Charts Section
+    if images:
+        pdf.add_page()
         pdf.set_font("Arial", "B", 14)
-        pdf.cell(0, 10, "Top Crime Zones", ln=True)
+        pdf.cell(0, 10, "Charts", ln=True)
         pdf.line(10, pdf.get_y(), 200, pdf.get_y())
         pdf.ln(5)
+        for caption, image_path in images:
+            if pdf.get_y() > 180:
+                pdf.add_page()
+            pdf.set_font("Arial", "B", 11)
+            pdf.cell(0, 8, str(caption).encode('latin-1', 'ignore').decode('latin-1'), ln=True)
+            pdf.image(image_path, x=20, w=170)
+            pdf.ln(5)
+
+    # Footer
+    pdf.ln(20)
+    pdf.set_font("Arial", "I", 8)
+    pdf.cell(0, 10, "This report is generated by CrimeScan Analytics Platform", ln=True, align="C")
+    pdf.cell(0, 5, "Data is processed and anonymized for security purposes", ln=True, align="C")
+
+    # PyFPDF returns the document as a latin-1 str, fpdf2 as a bytearray
+    output = pdf.output(dest="S")
+    return output.encode("latin-1") if isinstance(output, str) else bytes(output)
 
-        # Check if top_zones has data
-        if not top_zones.empty:
-            pdf.set_font("Arial", "B", 10)
-            # Table headers
-            pdf.cell(60, 8, "Location", 1, 0, "C")
-            pdf.cell(60, 8, "Crime Type", 1, 0, "C")
-            pdf.cell(30, 8, "Cases", 1, 0, "C")
-            pdf.cell(30, 8, "Severity", 1, 1, "C")
-
-            pdf.set_font("Arial", size=10)
-            for _, row in top_zones.head(10).iterrows():  # Limit to top 10
-                # Clean text to avoid encoding issues
-                location = str(row.get('Location', 'N/A')).encode('latin-1', 'ignore').decode('latin-1')[:25]
-                crime_type = str(row.get('Crime Type', 'N/A')).encode('latin-1', 'ignore').decode('latin-1')[:25]
-                cases = str(row.get('Cases', 0))
-                severity = str(row.get('Severity', 0))
-                
-                pdf.cell(60, 8, location, 1, 0)
-                pdf.cell(60, 8, crime_type, 1, 0)
-                pdf.cell(30, 8, cases, 1, 0, "C")
-                pdf.cell(30, 8, severity, 1, 1, "C")
-        else:
-            pdf.set_font("Arial", size=12)
-            pdf.cell(0, 8, "No crime zone data available", ln=True)
-
-        # Footer
-        pdf.ln(20)
-        pdf.set_font("Arial", "I", 8)
-        pdf.cell(0, 10, "This report is generated by CrimeScan Analytics Platform", ln=True, align="C")
-        pdf.cell(0, 5, "Data is processed and anonymized for security purposes", ln=True, align="C")
-
-        # Save file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_path = f"CrimeScan_Report_{timestamp}.pdf"
-        pdf.output(file_path)
-        
-        return file_path
-        
+@timed("pdf_export")
+def generate_pdf_report(summary_data, top_zones, scope=None, images=None):
+    try:
+        return render_pdf_report(summary_data, top_zones, scope, images)
     except Exception as e:
         st.error(f"Error generating PDF: {str(e)}")
         return None
+
+def report_file_name(label):
+    """File-system safe report name for a group label"""
+    safe = re.sub(r"[^A-Za-z0-9_-]+", "_", str(label)).strip("_") or "report"
+    return f"CrimeScan_Report_{safe}.pdf"
+
+def report_images(dataset_key, df, trend_series, clusters=None, cluster_params=()):
+    """Hotspot map plus one trend chart per (label, yearly series), all cached by dataset"""
+    charts = timed_import("charts")
+    images = [("Hotspot Map", charts.hotspot_map_image(dataset_key, df, clusters, cluster_params))]
+    for label, series in trend_series:
+        if len(series) > 1:
+            images.append((f"Trend: {label}", charts.trend_chart_image(dataset_key, label, series)))
+    # Charts that could not be cached are left out of the report
+    return [(caption, path) for caption, path in images if path is not None]
+
+def _render_group_reports(tasks):
+    """Render the reports for a chunk of (label, frame, col_area, group_col, dataset_key) tasks in a worker process"""
+    results = []
+    for label, frame, col_area, group_col, dataset_key in tasks:
+        try:
+            metrics = compute_metrics(frame, col_area)
+            images = None
+            if dataset_key is not None:
+                yearly = frame.groupby('Year')['cases'].sum()
+                images = report_images(f"{dataset_key}/{group_col}/{label}", frame, [(label, yearly)])
+            pdf_bytes = render_pdf_report(report_summary(metrics),
+                                          zone_table(metrics['top_zones'], col_area),
+                                          scope=label, images=images)
+            results.append((label, pdf_bytes, None))
+        except Exception as e:
+            results.append((label, None, str(e)))
+    return results
+
+def generate_reports_batch(df, group_col, col_area, dataset_key=None, max_workers=None, progress=None):
+    """Render one report per value of group_col across a process pool.
+
+    Returns a dict of label -> PDF bytes; no report files are written. When
+    dataset_key is given, each report embeds its group's hotspot map and
+    trend chart from the chart cache. Groups whose report failed are skipped.
+    `progress` is called as progress(done, total).
+    """
+    tasks = [(label, frame, col_area, group_col, dataset_key)
+             for label, frame in df.groupby(group_col, observed=True)]
+    workers = max_workers or os.cpu_count() or 1
+    chunk_size = max(1, len(tasks) // (workers * 4))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    reports = {}
+    done = 0
+    if chunks:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            futures = [pool.submit(_render_group_reports, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for label, pdf_bytes, error in future.result():
+                    if error is None:
+                        reports[label] = pdf_bytes
+                    done += 1
+                if progress:
+                    progress(done, len(tasks))
+    return reports
+
+def reports_zip(reports):
+    """Bundle rendered reports into an in-memory ZIP archive.
+
+    Labels that sanitize to the same file name (e.g. "A/B" and "A&B") get
+    _2, _3, ... suffixes so every report keeps its own archive member.
+    """
+    buffer = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for label, pdf_bytes in reports.items():
+            name = report_file_name(label)
+            stem, suffix = os.path.splitext(name)
+            n = 1
+            # Compared case-insensitively, as names are on Windows and macOS file systems
+            while name.lower() in used:
+                n += 1
+                name = f"{stem}_{n}{suffix}"
+            used.add(name.lower())
+            archive.writestr(name, pdf_bytes)
+    return buffer.getvalue()
@@ -0,0 +1,123 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+# Gazetteer whose cities anchor the synthetic areas
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv")
+
+# Column layout of the bundled crime datasets
+COLUMNS = ['Area_Name', 'Year', 'Group_Name', 'Cases_Property_Stolen', 'Latitude', 'Longitude', 'Severity']
+
+CRIME_TYPES = [
+    "Theft", "Burglary", "Armed Robbery", "Vehicle Theft", "Chain Snatching", "Pickpocketing",
+    "Cyber Crime", "Scams", "Extortion", "Drug Trafficking", "Drug Offenses", "Smuggling",
+    "Gang Violence", "Assault", "Communal Violence", "Political Violence", "Kidnapping",
+    "Human Trafficking", "Arms Trafficking", "Counterfeiting"
+]
+
+AREA_KINDS = [
+    "City Center", "Market Area", "Old City", "Railway Station", "Industrial Zone",
+    "Residential", "Bus Stand", "Port Area", "University Area", "Suburbs"
+]
+
+# Rows generated and written per batch by write_csv
+CHUNK_ROWS = 1_000_000
+
+
+def area_table(n_areas, rng):
+    """Named areas scattered around gazetteer cities, with a skewed crime rate each"""
+    cities = pd.read_csv(GAZETTEER_FILE)
+    city = rng.integers(0, len(cities), n_areas)
+    kind = np.arange(n_areas) % len(AREA_KINDS)
+    names = [f"{cities['name'].iat[c]} {AREA_KINDS[k]}" for c, k in zip(city, kind)]
+    # Disambiguate repeated city/kind pairs
+    seen = {}
+    for i, name in enumerate(names):
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            names[i] = f"{name} {seen[name]}"
+
+    return pd.DataFrame({
+        'name': names,
+        'latitude': cities['latitude'].to_numpy()[city] + rng.normal(0, 0.05, n_areas),
+        'longitude': cities['longitude'].to_numpy()[city] + rng.normal(0, 0.05, n_areas),
+        # A few areas carry most of the crime, as in real data
+        'weight': 1 / np.arange(1, n_areas + 1) ** 0.8,
+        'rate': rng.lognormal(np.log(12), 0.6, n_areas),
+        'growth': rng.normal(0.02, 0.04, n_areas)
+    })
+
+
+def generate_rows(n_rows, areas, years, rng, dates=False):
+    """Draw n_rows records for the given area table and (first, last) years.
+
+    With `dates` each record also gets a Date: a timestamp uniformly spread
+    over its year.
+    """
+    area = rng.choice(len(areas), n_rows, p=areas['weight'] / areas['weight'].sum())
+    crime_weight = 1 / np.arange(1, len(CRIME_TYPES) + 1) ** 0.6
+    crime = rng.choice(len(CRIME_TYPES), n_rows, p=crime_weight / crime_weight.sum())
+    year = rng.integers(years[0], years[1] + 1, n_rows)
+
+    crime_factor = np.linspace(1.5, 0.5, len(CRIME_TYPES))[crime]
+    trend = (1 + areas['growth'].to_numpy()[area]) ** (year - years[0])
+    cases = rng.poisson(areas['rate'].to_numpy()[area] * crime_factor * trend)
+    severity = np.digitize(cases, [10, 20, 30, 40], right=True) + 1
+
+    df = pd.DataFrame({
+        'Area_Name': pd.Categorical.from_codes(area, categories=areas['name']),
+        'Year': year,
+        'Group_Name': pd.Categorical.from_codes(crime, categories=CRIME_TYPES),
+        'Cases_Property_Stolen': cases,
+        'Latitude': (areas['latitude'].to_numpy()[area] + rng.normal(0, 0.005, n_rows)).round(4),
+        'Longitude': (areas['longitude'].to_numpy()[area] + rng.normal(0, 0.005, n_rows)).round(4),
+        'Severity': severity
+    }, columns=COLUMNS)
+    if dates:
+        year_start = (year - 1970).astype('datetime64[Y]').astype('datetime64[s]')
+        df['Date'] = year_start + rng.integers(0, 365 * 86400, n_rows).astype('timedelta64[s]')
+    return df
+
+
+def default_area_count(n_rows):
+    return int(np.clip(n_rows // 200, 20, 5000))
+
+
+def generate(n_rows, n_areas=None, years=(2001, 2023), seed=0, dates=False):
+    """A synthetic crime dataset with the bundled CSVs' schema.
+
+    Cases follow a Poisson rate per area and crime type with a per-area yearly
+    trend; areas and crime types have skewed frequencies so that hotspots
+    emerge. Severity uses the same case bins as clean_dataset.
+    """
+    rng = np.random.default_rng(seed)
+    areas = area_table(n_areas or default_area_count(n_rows), rng)
+    return generate_rows(n_rows, areas, years, rng, dates)
+
+
+def write_csv(path, n_rows, n_areas=None, years=(2001, 2023), seed=0, dates=False, chunk_rows=CHUNK_ROWS):
+    """Write a synthetic dataset to CSV in batches, so 10M-row files fit in memory"""
+    rng = np.random.default_rng(seed)
+    areas = area_table(n_areas or default_area_count(n_rows), rng)
+    with open(path, "w", newline="") as f:
+        for start in range(0, n_rows, chunk_rows):
+            chunk = generate_rows(min(chunk_rows, n_rows - start), areas, years, rng, dates)
+            chunk.to_csv(f, index=False, header=start == 0)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic CrimeScan dataset")
+    parser.add_argument("rows", type=int, help="number of rows (e.g. 1000 to 10000000)")
+    parser.add_argument("-o", "--output", help="CSV path (default: synthetic_<rows>.csv)")
+    parser.add_argument("--areas", type=int, help="number of distinct areas")
+    parser.add_argument("--first-year", type=int, default=2001)
+    parser.add_argument("--last-year", type=int, default=2023)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dates", action="store_true", help="add an incident timestamp column")
+    args = parser.parse_args()
+
+    output = args.output or f"synthetic_{args.rows}.csv"
+    write_csv(output, args.rows, args.areas, (args.first_year, args.last_year), args.seed, args.dates)
+    print(f"Wrote {args.rows:,} rows to {output}")
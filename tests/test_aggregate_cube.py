@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate_cube import AggregateCube, time_buckets, AREA
+
+
+def test_weeks_start_on_monday():
+    dates = pd.to_datetime(['2024-03-03', '2024-03-04', '2024-03-06 23:59', '2024-03-10', '1969-12-31'], format='ISO8601')
+    weeks = time_buckets(dates.to_numpy(), 'W')
+    assert list(pd.DatetimeIndex(weeks)) == list(pd.to_datetime(
+        ['2024-02-26', '2024-03-04', '2024-03-04', '2024-03-04', '1969-12-29']))
+
+
+def test_weeks_match_pandas_periods():
+    dates = pd.date_range('1969-12-01', '2024-12-31', freq='37h')
+    expected = dates.to_period('W-SUN').start_time
+    assert (pd.DatetimeIndex(time_buckets(dates.to_numpy(), 'W')) == expected).all()
+
+
+def test_days_and_months():
+    dates = pd.to_datetime(['2024-02-29 13:45', '2024-03-01 00:00'])
+    assert list(pd.DatetimeIndex(time_buckets(dates.to_numpy(), 'D'))) == list(pd.to_datetime(['2024-02-29', '2024-03-01']))
+    assert list(pd.DatetimeIndex(time_buckets(dates.to_numpy(), 'M'))) == list(pd.to_datetime(['2024-02-01', '2024-03-01']))
+
+
+def test_unknown_granularity():
+    with pytest.raises(ValueError):
+        time_buckets(np.array(['2024-01-01'], dtype='datetime64[ns]'), 'Q')
+
+
+def _frame(*dates):
+    dates = pd.DatetimeIndex(dates)
+    return pd.DataFrame({'area': 'A', 'Group_Name': 'Theft', 'cases': 1, 'Date': dates, 'Year': dates.year})
+
+
+def _daily(last_date):
+    return _frame(*pd.date_range('2024-01-01', last_date, freq='D'))
+
+
+def test_partial_last_period_is_left_out():
+    cube = AggregateCube.from_frame(_daily('2024-03-06'), 'area', granularity='M', coverage_end='2024-03-06 14:00')
+    assert cube.partial_period == pd.Timestamp('2024-03-01')
+    assert list(cube.matrix(AREA).columns) == list(pd.to_datetime(['2024-01-01', '2024-02-01']))
+    assert cube.location_series('A').iloc[-1] == 29
+    assert cube.totals().sum() == 66
+
+
+def test_complete_last_period_is_kept():
+    cube = AggregateCube.from_frame(_daily('2024-03-31'), 'area', granularity='M', coverage_end='2024-03-31 23:00')
+    assert cube.partial_period is None
+    assert cube.matrix(AREA).columns[-1] == pd.Timestamp('2024-03-01')
+
+
+def test_partial_last_year_is_left_out():
+    cube = AggregateCube.from_frame(_daily('2025-06-30'), 'area', granularity='Y', coverage_end='2025-06-30')
+    assert cube.partial_period == 2025
+    assert list(cube.location_series('A').index) == [2024]
+
+
+def test_sparse_data_without_coverage_end_keeps_every_period():
+    df = _frame('2021-12-30', '2022-12-30', '2023-12-30')
+    yearly = AggregateCube.from_frame(df, 'area', granularity='Y')
+    assert yearly.partial_period is None
+    assert list(yearly.location_series('A').index) == [2021, 2022, 2023]
+    monthly = AggregateCube.from_frame(df, 'area', granularity='M')
+    assert monthly.partial_period is None
+    assert monthly.matrix(AREA).columns[-1] == pd.Timestamp('2023-12-01')
+
+
+def test_coverage_end_after_last_period_keeps_it():
+    df = _frame('2021-12-30', '2022-12-30', '2023-12-30')
+    cube = AggregateCube.from_frame(df, 'area', granularity='Y', coverage_end=pd.Timestamp('2026-10-18'))
+    assert cube.partial_period is None
+    assert cube.location_series('A').index[-1] == 2023
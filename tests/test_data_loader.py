@@ -0,0 +1,21 @@
+import pandas as pd
+
+from data_loader import file_hash, parse_dates, sources_hash
+
+
+def test_mixed_utc_offsets_parse_to_naive_utc():
+    dates = parse_dates(pd.Series(['2021-01-01 10:00+05:30', '2021-01-02 10:00+00:00', 'not a date', None]))
+    assert pd.api.types.is_datetime64_dtype(dates)
+    assert dates.tolist()[:2] == [pd.Timestamp('2021-01-01 04:30'), pd.Timestamp('2021-01-02 10:00')]
+    assert dates.iloc[2:].isna().all()
+
+
+def test_naive_values_keep_their_time():
+    dates = parse_dates(pd.Series(['2021-01-01 10:00', '03/02/2021 11:00']))
+    assert dates.tolist() == [pd.Timestamp('2021-01-01 10:00'), pd.Timestamp('2021-03-02 11:00')]
+
+
+def test_sources_hash_accepts_known_file_hashes():
+    sources = [('b.csv', b'x,y\n1,2\n'), ('a.csv', b'x,y\n3,4\n')]
+    assert sources_hash(sources, [file_hash(data) for _, data in sources]) == sources_hash(sources)
+    assert sources_hash(sources) == sources_hash(sources[::-1])
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from dataset_registry import DatasetRegistry
+
+
+def test_uncached_builds_of_one_key_never_overlap():
+    # With no budget nothing is cached, so every caller builds, one at a time
+    registry = DatasetRegistry(max_bytes=0)
+    running, overlaps = [], []
+
+    def build():
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.005)
+        running.pop()
+        return list(range(10))
+
+    def worker():
+        for _ in range(5):
+            registry.get_or_create('key', build)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(overlaps) == 40
+    assert max(overlaps) == 1
+    assert registry._building == {}
+
+
+def test_concurrent_callers_share_one_build():
+    registry = DatasetRegistry()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.02)
+        return [1, 2, 3]
+
+    threads = [threading.Thread(target=registry.get_or_create, args=('key', build)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert registry.get_or_create('key', build) == [1, 2, 3]
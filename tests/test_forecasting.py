@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from forecasting import batch_forecast, seasonal_order_for, future_index, SEASONAL_ORDERS
+
+
+def test_seasonal_order_needs_two_seasons():
+    assert seasonal_order_for('M', 26) == SEASONAL_ORDERS['M']
+    assert seasonal_order_for('M', 25) == (0, 0, 0, 0)
+    assert seasonal_order_for('W', 106) == SEASONAL_ORDERS['W']
+    assert seasonal_order_for('D', 15) == (0, 0, 0, 0)
+    assert seasonal_order_for('D', 16) == SEASONAL_ORDERS['D']
+
+
+def test_yearly_series_are_not_seasonal():
+    assert seasonal_order_for('Y', 1000) == (0, 0, 0, 0)
+
+
+def test_future_index_follows_index_frequency():
+    weeks = pd.date_range('2024-01-01', periods=10, freq='W-MON', name='period')
+    future = future_index(weeks, 2)
+    assert list(future) == list(pd.to_datetime(['2024-03-11', '2024-03-18']))
+    assert future.name == 'period'
+
+
+def test_future_index_infers_missing_frequency():
+    months = pd.DatetimeIndex(pd.date_range('2024-01-01', periods=6, freq='MS').to_list())
+    assert months.freq is None
+    assert list(future_index(months, 3)) == list(pd.to_datetime(['2024-07-01', '2024-08-01', '2024-09-01']))
+
+
+def test_future_index_of_years():
+    assert list(future_index(pd.Index([2020, 2021, 2022]), 2)) == [2023, 2024]
+
+
+def test_change_from_zero_cases_is_undefined():
+    matrix = pd.DataFrame([[4.0, 2.0, 0.0], [1.0, 2.0, 3.0]], index=pd.Index(['A', 'B'], name='area'),
+                          columns=[2021, 2022, 2023])
+    table = batch_forecast(matrix).set_index('area')
+    assert pd.isna(table.loc['A', 'change_pct'])
+    assert np.isfinite(table.loc['B', 'change_pct'])
+    assert list(table.index) == ['B', 'A']
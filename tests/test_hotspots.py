@@ -0,0 +1,60 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hotspots import cluster_labels, EARTH_RADIUS_KM
+from synthetic_data import generate
+
+
+def _random_frame(rng, n):
+    centers = rng.uniform([10, 70], [30, 90], (rng.integers(1, 8), 2))
+    picked = centers[rng.integers(0, len(centers), n)]
+    df = pd.DataFrame({
+        'Latitude': picked[:, 0] + rng.normal(0, rng.choice([0.01, 0.1, 0.5]), n),
+        'Longitude': picked[:, 1] + rng.normal(0, 0.2, n),
+        'cases': rng.integers(1, 20, n).astype(float)
+    })
+    if rng.random() < 0.5:
+        # Geocoded data: many rows share one coordinate
+        df[['Latitude', 'Longitude']] = df[['Latitude', 'Longitude']].round(1)
+    return df
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_sklearn_dbscan(seed):
+    from sklearn.cluster import DBSCAN
+    rng = np.random.default_rng(seed)
+    df = _random_frame(rng, int(rng.integers(50, 2000)))
+    eps_km, min_cases = float(rng.choice([1, 5, 25, 100])), int(rng.choice([1, 20, 50, 300]))
+
+    reference = DBSCAN(eps=eps_km / EARTH_RADIUS_KM, min_samples=min_cases, metric='haversine',
+                       algorithm='ball_tree').fit(np.radians(df[['Latitude', 'Longitude']].to_numpy()),
+                                                  sample_weight=df['cases'].to_numpy())
+    labels = cluster_labels(df, eps_km, min_cases)
+
+    core = reference.core_sample_indices_
+    assert (labels[core] == reference.labels_[core]).all()
+    assert ((labels == -1) == (reference.labels_ == -1)).all()
+
+
+def test_fractional_weights():
+    rng = np.random.default_rng(0)
+    df = _random_frame(rng, 500)
+    whole = cluster_labels(df, 25, 50)
+    df['cases'] = df['cases'] / 2
+    assert (cluster_labels(df, 25, 25) == whole).all()
+
+
+def test_large_dataset_memory():
+    df = generate(120_000, seed=0).rename(columns={'Cases_Property_Stolen': 'cases'})
+    tracemalloc.start()
+    try:
+        labels = cluster_labels(df, 25, 50)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(labels) == len(df) and labels.max() >= 0
+    # Neighbour lists would need gigabytes here
+    assert peak < 200 * 2**20
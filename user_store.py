@@ -0,0 +1,192 @@
+import sqlite3
+import threading
+import tempfile
+import json
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows - fall back to in-process locking only
+    fcntl = None
+
+# File to store user credentials (JSON backend)
+USERS_FILE = "users.json"
+
+# Database to store user credentials (SQLite backend)
+USERS_DB = os.environ.get("CRIMESCAN_USERS_DB", "users.sqlite")
+
+# Which backend to use: "json" or "sqlite"
+USER_STORE_BACKEND = os.environ.get("CRIMESCAN_USER_STORE", "json")
+
+
+class JsonUserStore:
+    """Users kept in a JSON file.
+
+    Reads are served from memory until the file's mtime or size changes.
+    Writes take an exclusive lock, re-read the file, and replace it atomically,
+    so concurrent registrations from several sessions or processes are not lost.
+    """
+
+    def __init__(self, path=USERS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._users = {}
+        self._stamp = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        """All users, re-read from disk only when the file has changed"""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            users = self._read() if stamp is not None else {}
+            with self._lock:
+                self._users, self._stamp = users, stamp
+        return self._users
+
+    def get(self, username):
+        return self.load().get(username)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, users):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".users-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(users, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._users, self._stamp = users, self._file_stamp()
+
+    def add(self, username, record):
+        """Add a user; returns False if the username is already taken"""
+        with self._write_lock():
+            users = self._read()
+            if username in users:
+                return False
+            users[username] = record
+            self._write(users)
+            return True
+
+    def update(self, username, record):
+        """Replace an existing user's record; returns False if there is no such user"""
+        with self._write_lock():
+            users = self._read()
+            if username not in users:
+                return False
+            users[username] = record
+            self._write(users)
+            return True
+
+    def save_all(self, users):
+        """Replace every stored user at once"""
+        with self._write_lock():
+            self._write(dict(users))
+
+
+class SqliteUserStore:
+    """Users kept in SQLite, looked up through the username primary-key index"""
+
+    def __init__(self, path=USERS_DB, import_from=USERS_FILE):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, password TEXT NOT NULL, email TEXT)"
+            )
+            empty = conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+        # One-time import of accounts registered with the JSON backend
+        if empty and import_from and os.path.exists(import_from):
+            self.save_all(JsonUserStore(import_from).load())
+
+    @contextmanager
+    def _connect(self):
+        """A connection whose work is committed as one transaction, then closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT username, password, email FROM users").fetchall()
+        return {username: {"password": password, "email": email} for username, password, email in rows}
+
+    def get(self, username):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT password, email FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return None if row is None else {"password": row[0], "email": row[1]}
+
+    def add(self, username, record):
+        """Add a user; returns False if the username is already taken"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
+                    (username, record["password"], record.get("email"))
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update(self, username, record):
+        """Replace an existing user's record; returns False if there is no such user"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE users SET password = ?, email = ? WHERE username = ?",
+                (record["password"], record.get("email"), username)
+            )
+        return cursor.rowcount > 0
+
+    def save_all(self, users):
+        """Replace every stored user at once"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany(
+                "INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
+                [(name, record["password"], record.get("email")) for name, record in users.items()]
+            )
+
+
+@lru_cache(maxsize=1)
+def get_user_store():
+    """The process-wide user store for the configured backend"""
+    if USER_STORE_BACKEND == "sqlite":
+        return SqliteUserStore()
+    return JsonUserStore()